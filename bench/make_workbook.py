@@ -0,0 +1,90 @@
+"""Generate synthetic products.xlsx workbooks for benchmarking.
+
+Cardinalities follow the real catalogue: a handful of categories, a couple of
+dozen sectors, one product year per season, and mostly unique titles.
+
+    python bench/make_workbook.py 1000 10000 100000 --out bench/data
+"""
+import argparse
+import os
+import random
+
+COLUMNS = ["Title", "Year", "Sector", "Category", "URL", "Image_URL", "Description"]
+
+CATEGORIES = {
+    "Interactive Dashboards": "/assets/interactive_dashboard.png",
+    "Static Dashboards": "/assets/static_dashboard.png",
+    "Maps": "/assets/maps.png",
+    "Infographics": "/assets/Infographics.png",
+    "Reports": "/assets/reports.png",
+    "Analysis": "/assets/analysis.png",
+    "Web Apps": "/assets/web_apps.png",
+    "Training Materials": "/assets/training_materials.png",
+    "Assessment": "/assets/analysis.png",
+}
+SECTORS = [
+    "Child Protection", "Education", "Food Security", "GBV AoR", "Health", "Nutrition", "Protection",
+    "Shelter", "WASH", "CCCM", "Early Recovery", "Logistics", "Mine Action", "Housing Land and Property",
+    "Emergency Telecommunications", "Camp Coordination", "Cash", "Multi-Sector", "Livelihoods", "Coordination",
+]
+YEARS = [f"{year}/{year + 1}" for year in range(2018, 2027)]
+PLACES = ["Borno", "Yobe", "Adamawa", "Maiduguri", "Bama", "Gwoza", "Monguno", "Damaturu", "Mubi", "Konduga",
+          "Dikwa", "Ngala", "Jere", "Biu", "Potiskum", "Northeast Nigeria"]
+TOPICS = ["Flood", "Cholera", "Displacement", "Market", "Service Mapping", "Needs Assessment", "Returns",
+          "Access Constraints", "Partner Presence", "Outbreak", "Malnutrition", "Water Points", "School",
+          "Health Facility", "Protection Monitoring", "Price Monitoring", "Response Gaps", "Rainy Season"]
+KINDS = {
+    "Interactive Dashboards": "Dashboard", "Static Dashboards": "Snapshot", "Maps": "Map",
+    "Infographics": "Infographic", "Reports": "Report", "Analysis": "Analysis", "Web Apps": "Web App",
+    "Training Materials": "Training", "Assessment": "Assessment",
+}
+
+
+def synthetic_rows(count, seed=0):
+    rng = random.Random(seed)
+    # Skewed like the real data: a few big categories/sectors, a long tail
+    category_weights = [rng.uniform(1, 6) for _ in CATEGORIES]
+    sector_weights = [1 / (i + 1) for i in range(len(SECTORS))]
+    for i in range(count):
+        category = rng.choices(list(CATEGORIES), category_weights)[0]
+        sector = rng.choices(SECTORS, sector_weights)[0]
+        year = rng.choice(YEARS)
+        title = f"{rng.choice(PLACES)} {rng.choice(TOPICS)} {KINDS[category]} {i + 1}"
+        description = (f"{title} covering {sector.lower()} for the {year} response in "
+                       f"{rng.choice(PLACES)} and {rng.choice(PLACES)}.")
+        yield [title, year, sector, category, f"https://example.org/products/{i + 1}", CATEGORIES[category],
+               description]
+
+
+def write_workbook(path, count, seed=0):
+    from openpyxl import Workbook
+
+    # write_only streams rows to disk instead of building the sheet in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(COLUMNS)
+    for row in synthetic_rows(count, seed):
+        sheet.append(row)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    workbook.save(path)
+    return path
+
+
+def workbook_path(out_dir, count):
+    return os.path.join(out_dir, f"products_{count}.xlsx")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", nargs="*", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for count in args.rows:
+        path = write_workbook(workbook_path(args.out, count), count, args.seed)
+        print(f"Wrote {count} rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""Benchmark and load test for the catalogue app.
+
+For each synthetic workbook size it measures:
+
+- cold start: interpreter + `import app` + first /_dash-layout, once without
+  and once with the compiled catalogue snapshot, and once in the lazy startup
+  mode, with the process RSS and the app's own boot phases (startup.py);
+- replayed user sessions (page load -> category page -> sector -> year ->
+  title -> search type-ahead) against app.server, either in-process through the
+  Flask test client or over HTTP against a local gunicorn (--gunicorn);
+- p50/p99 latency per request kind, requests per second and per-worker RSS
+  (and private memory, which leaves out the shared catalogue snapshot).
+
+    python bench/run_bench.py --rows 1000 10000 100000 --sessions 200 --concurrency 8
+    python bench/run_bench.py --rows 10000 --gunicorn --workers 2 --json bench_results.json
+
+Workbooks are generated on first use (see make_workbook.py). Each run uses its
+own snapshot file, so the app's src/build/ snapshot is never touched.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, BENCH_DIR)
+
+from make_workbook import workbook_path, write_workbook  # noqa: E402
+
+SEARCH_QUERIES = ["bo", "borno", "borno fl", "cholera", "health ma", "2024"]
+
+
+def rss_kb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def private_kb(pid="self"):
+    # Memory not shared with other processes (the mapped catalogue snapshot is shared between workers)
+    total = None
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                    total = (total or 0) + int(line.split()[1])
+    except OSError:
+        pass
+    return total
+
+
+def child_pids(pid):
+    # Linux only: processes whose parent is `pid` (gunicorn workers)
+    pids = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return pids
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def app_env(workbook, snapshot):
+    env = dict(os.environ)
+    env.update(CATALOGUE_FILE=workbook, CATALOGUE_SNAPSHOT=snapshot, CATALOGUE_RELOAD_INTERVAL="0",
+               LINK_CHECK_INTERVAL="0")  # the synthetic links point at example.org
+    return env
+
+
+# --- transports ---------------------------------------------------------------
+
+class TestClientTransport:
+    """Requests straight into app.server through the Flask test client (one per thread)."""
+
+    def __init__(self, server):
+        self.server = server
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.server.test_client()
+        return client
+
+    def request(self, method, path, body=None):
+        response = self._client().open(path, method=method, json=body, headers={"Accept-Encoding": "identity"})
+        return response.status_code, response.get_data()
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+# --- session replay -------------------------------------------------------------
+
+def find_component(tree, component_id):
+    # Depth-first search of a serialized Dash component tree
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            props = node.get("props")
+            if isinstance(props, dict):
+                if props.get("id") == component_id:
+                    return props
+                stack.append(props.get("children"))
+    return None
+
+
+class Session:
+    """One simulated visitor replaying the category -> sector -> year -> title flow."""
+
+    def __init__(self, transport, dependencies, categories, rng, record):
+        self.transport = transport
+        self.dependencies = dependencies
+        self.categories = categories
+        self.rng = rng
+        self.record = record
+        self._options = {}
+
+    def timed(self, label, method, path, body=None):
+        start = time.perf_counter()
+        status, data = self.transport.request(method, path, body)
+        self.record(label, time.perf_counter() - start, status, len(data))
+        return status, data
+
+    def callback(self, label, input_id, values, changed):
+        # Build the /_dash-update-component body from the registered callback definition
+        dep = self.dependencies[input_id]
+        outputs = [{"id": o.rsplit(".", 1)[0], "property": o.rsplit(".", 1)[1]}
+                   for o in dep["output"].strip(".").split("...")]
+        body = {
+            "output": dep["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [dict(i, value=values.get(f'{i["id"]}.{i["property"]}')) for i in dep["inputs"]],
+            "state": [dict(s, value=values.get(f'{s["id"]}.{s["property"]}')) for s in dep["state"]],
+            "changedPropIds": [changed],
+        }
+        status, data = self.timed(label, "POST", "/_dash-update-component", body)
+        if status != 200:
+            return {}
+        return json.loads(data).get("response", {})
+
+    def run(self):
+        self.timed("GET /", "GET", "/")
+        self.timed("GET /_dash-layout", "GET", "/_dash-layout")
+        self.timed("GET /_dash-dependencies", "GET", "/_dash-dependencies")
+
+        category = self.rng.choice(self.categories)
+        page = self.callback("update_page_content", "url.pathname",
+                             {"url.pathname": category, "url.search": ""}, "url.pathname")
+        tree = page.get("page-content", {}).get("children")
+        sector = find_component(tree, "sector-dropdown")
+        if sector is None:
+            return
+        values = {
+            "url.pathname": category,
+            "stored-section-head.data": find_component(tree, "stored-section-head")["data"],
+            "sector-dropdown.value": sector["value"],
+            "year-dropdown.value": find_component(tree, "year-dropdown").get("value"),
+            "product-dropdown.value": find_component(tree, "product-dropdown").get("value"),
+        }
+
+        # Walk down the filter chain the way a user would
+        for dropdown, options_from in (("sector-dropdown", sector.get("options")),
+                                       ("year-dropdown", None), ("product-dropdown", None)):
+            options = options_from if options_from is not None else self._options.get(dropdown, {}).get("options")
+            if not options:
+                break
+            values[f"{dropdown}.value"] = self.rng.choice(options)["value"]
+            response = self.callback(f"update_selection ({dropdown.split('-')[0]})", "sector-dropdown.value",
+                                     values, f"{dropdown}.value")
+            self._options = response
+            for key in ("year-dropdown", "product-dropdown"):
+                if "value" in response.get(key, {}):
+                    values[f"{key}.value"] = response[key]["value"]
+
+        query = self.rng.choice(SEARCH_QUERIES)
+        for end in range(2, len(query) + 1, 2):  # type-ahead: a request every couple of keystrokes
+            self.callback("update_search_results", "search-input.value",
+                          {"search-input.value": query[:end], "url.pathname": category}, "search-input.value")
+
+
+def replay(transport, sessions, concurrency, seed=0):
+    _, data = transport.request("GET", "/_dash-dependencies")
+    dependencies = {}
+    for dep in json.loads(data):
+        for i in dep["inputs"]:
+            if isinstance(i["id"], str):
+                dependencies.setdefault(f'{i["id"]}.{i["property"]}', dep)
+    # The nav links come with the homepage content
+    home = Session(transport, dependencies, [], None, lambda *args: None).callback(
+        "update_page_content", "url.pathname", {"url.pathname": "/", "url.search": ""}, "url.pathname")
+    nav = home.get("nav-menu", {}).get("children", [])
+    categories = [link["props"]["href"] for link in nav if link["props"]["href"] != "/"]
+
+    samples = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def record(label, seconds, status, size):
+        with lock:
+            samples.setdefault(label, []).append((seconds, size))
+            if status >= 400:
+                errors[label] = errors.get(label, 0) + 1
+
+    def run_session(i):
+        Session(transport, dependencies, categories, random.Random(seed + i), record).run()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run_session, range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(v) for v in samples.values())
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1) if elapsed else None,
+        "requests_by_kind": {
+            label: {
+                "count": len(values),
+                "p50_ms": round(percentile([s for s, _ in values], 50) * 1000, 2),
+                "p99_ms": round(percentile([s for s, _ in values], 99) * 1000, 2),
+                "mean_bytes": int(sum(b for _, b in values) / len(values)),
+                "errors": errors.get(label, 0),
+            }
+            for label, values in sorted(samples.items())
+        },
+    }
+
+
+# --- child process entry points -------------------------------------------------
+
+def child_cold_start():
+    start = time.perf_counter()
+    sys.path.insert(0, SRC_DIR)
+    os.chdir(SRC_DIR)
+    import app
+    imported = time.perf_counter()
+    status = app.server.test_client().get("/_dash-layout").status_code  # waits for a lazy warm-up
+    ready = time.perf_counter()
+    print(json.dumps({
+        "import_s": round(imported - start, 3),
+        "first_layout_s": round(ready - imported, 3),
+        "status": status,
+        "products": len(app.catalogue_store.current().products),
+        "rss_kb": rss_kb(),
+        "pandas_imported": "pandas" in sys.modules,
+        "phases": dict((phase["phase"], phase["seconds"]) for phase in app.startup.report()["phases"]),
+    }))
+
+
+def child_replay(sessions, concurrency):
+    sys.path.insert(0, SRC_DIR)
+    os.chdir(SRC_DIR)
+    import app
+    results = replay(TestClientTransport(app.server), sessions, concurrency)
+    results["rss_kb"] = {"in-process": rss_kb()}
+    print(json.dumps(results))
+
+
+def run_child(args, env):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, os.path.abspath(__file__)] + args, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    wall = time.perf_counter() - start
+    return json.loads(output.strip().splitlines()[-1]), wall
+
+
+# --- drivers -------------------------------------------------------------------
+
+def cold_start(workbook, snapshot):
+    results = {}
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+    # The first boot parses Excel and writes the snapshot; the lazy one loads it after import
+    for label, mode in (("excel", "eager"), ("snapshot", "eager"), ("lazy", "lazy")):
+        result, wall = run_child(["_cold_start"], dict(app_env(workbook, snapshot), STARTUP_MODE=mode))
+        result["process_s"] = round(wall, 3)
+        results[label] = result
+    return results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def gunicorn_replay(workbook, snapshot, sessions, concurrency, workers):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--chdir", SRC_DIR, "-w", str(workers), "-b", f"127.0.0.1:{port}",
+         "--threads", str(max(1, concurrency // workers)), "app:server"],
+        env=app_env(workbook, snapshot), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(base_url + "/_dash-layout", timeout=5) as response:
+                    if response.status == 200:
+                        break
+            except (urllib.error.URLError, ConnectionError):
+                if process.poll() is not None:
+                    raise RuntimeError("gunicorn exited during startup")
+                time.sleep(0.05)
+        ready = time.perf_counter() - start
+
+        results = replay(HttpTransport(base_url), sessions, concurrency)
+        results["cold_start_s"] = round(ready, 3)
+        workers = child_pids(process.pid)
+        results["rss_kb"] = {f"worker {pid}": rss_kb(pid) for pid in workers}
+        results["private_kb"] = {f"worker {pid}": private_kb(pid) for pid in workers}
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def print_report(size, report):
+    print(f"\n=== {size} rows ===")
+    for label, result in report["cold_start"].items():
+        print(f"cold start ({label}): process {result['process_s']}s, import {result['import_s']}s, "
+              f"first layout {result['first_layout_s']}s, RSS {result['rss_kb']} kB")
+        print("  phases: " + ", ".join(f"{phase} {seconds}s" for phase, seconds in result["phases"].items()))
+    load = report["load"]
+    print(f"load: {load['requests']} requests in {load['seconds']}s = {load['rps']} req/s "
+          f"({load['sessions']} sessions, concurrency {load['concurrency']})")
+    if "cold_start_s" in load:
+        print(f"gunicorn ready after {load['cold_start_s']}s")
+    for worker, kb in load["rss_kb"].items():
+        private = load.get("private_kb", {}).get(worker)
+        print(f"RSS {worker}: {kb} kB" + (f" (private {private} kB)" if private is not None else ""))
+    print(f"{'request':40} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'bytes':>9} {'errors':>7}")
+    for label, row in load["requests_by_kind"].items():
+        print(f"{label:40} {row['count']:>7} {row['p50_ms']:>9} {row['p99_ms']:>9} {row['mean_bytes']:>9} "
+              f"{row['errors']:>7}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "_cold_start":
+        return child_cold_start()
+    if len(sys.argv) > 1 and sys.argv[1] == "_replay":
+        return child_replay(int(sys.argv[2]), int(sys.argv[3]))
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--gunicorn", action="store_true", help="replay over HTTP against a local gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--data", default=os.path.join(BENCH_DIR, "data"))
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.rows:
+            workbook = workbook_path(args.data, size)
+            if not os.path.exists(workbook):
+                write_workbook(workbook, size)
+            snapshot = os.path.join(tmp, f"products_{size}.snapshot")
+
+            report = {"cold_start": cold_start(workbook, snapshot)}
+            if args.gunicorn:
+                report["load"] = gunicorn_replay(workbook, snapshot, args.sessions, args.concurrency, args.workers)
+            else:
+                report["load"], _ = run_child(["_replay", str(args.sessions), str(args.concurrency)],
+                                              app_env(workbook, snapshot))
+            results[size] = report
+            print_report(size, report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
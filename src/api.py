@@ -0,0 +1,177 @@
+"""Read-only JSON API over the catalogue, for partner dashboards and scripts.
+
+    GET /api/products?category=maps&sector=WASH&year=2024/2025&fields=Title,URL&limit=100
+    GET /api/products?cursor=<next from the previous page>
+    GET /api/products?format=ndjson           (streams every matching product, one per line)
+    GET /api/facets?category=maps              (product counts per category, sector and year)
+    GET /api/products?tenant=nigeria           (a country office's catalogue instead of the default)
+
+Filters can be repeated (`sector=WASH&sector=Health`) and match any of the
+given values. Products come in the same order as the category pages' dropdowns
+(category, sector, year, title). The `next` cursor belongs to one catalogue
+version: a page requested after a reload answers 410 and the listing must be
+restarted. Both endpoints are versioned paths of the response layer, so clients
+revalidating with If-None-Match get a 304 until the catalogue changes.
+"""
+import base64
+import binascii
+import json
+
+from flask import Response, jsonify, request
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Lines serialized per chunk of an NDJSON export
+STREAM_BATCH = 500
+
+LINK_FIELD = "link"
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def encode_cursor(version, offset):
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        version, offset = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().rsplit(":", 1)
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise APIError("invalid cursor") from None
+    if offset < 0:  # never issued; would page backwards out of the selected groups
+        raise APIError("invalid cursor")
+    return version, offset
+
+
+def _filter(name):
+    # All values of a repeatable filter (?sector=WASH&sector=Health); None when it is absent
+    values = [value for value in request.args.getlist(name) if value != ""]
+    return values or None
+
+
+def _by_value(totals):
+    # Values can be a mix of types (e.g. Year read as int or str), so order them as strings
+    return sorted(totals.items(), key=lambda item: str(item[0]))
+
+
+class CatalogueAPI:
+    """Registers /api/products and /api/facets on a Flask app.
+
+    `current()` returns the Catalogue to answer from (it may raise APIError);
+    `link(catalogue, product)` builds the product's page link, returned as the
+    `link` field.
+    """
+
+    def __init__(self, current, link=None, prefix="/api"):
+        self.current = current
+        self.link = link
+        self.prefix = prefix
+
+    @property
+    def paths(self):
+        # For the response layer's versioned (ETag) paths
+        return [f"{self.prefix}/products", f"{self.prefix}/facets"]
+
+    def init_app(self, server):
+        server.add_url_rule(f"{self.prefix}/products", "api_products", self.products)
+        server.add_url_rule(f"{self.prefix}/facets", "api_facets", self.facets)
+        server.register_error_handler(APIError, self._error)
+
+    def _error(self, error):
+        return jsonify({"error": str(error)}), error.status
+
+    def _fields(self, catalogue):
+        available = catalogue.products.columns + ([LINK_FIELD] if self.link is not None else [])
+        fields = request.args.get("fields")
+        if not fields:
+            return available
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in available]
+        if unknown:
+            raise APIError(f"unknown fields: {', '.join(unknown)}")
+        return fields
+
+    def _limit(self):
+        try:
+            limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise APIError("limit must be an integer") from None
+        return min(max(limit, 1), MAX_LIMIT)
+
+    def _groups(self, catalogue):
+        return catalogue.index.select_groups(_filter("category"), _filter("sector"), _filter("year"))
+
+    def _record(self, catalogue, row, fields):
+        product = catalogue.products[row]
+        return {field: self.link(catalogue, product) if field == LINK_FIELD else product[field] for field in fields}
+
+    def products(self):
+        # Grab the snapshot once; a reload mid-request (or mid-stream) does not mix versions
+        catalogue = self.current()
+        fields = self._fields(catalogue)
+        groups = self._groups(catalogue)
+
+        if request.args.get("format") == "ndjson":
+            return Response(self._stream(catalogue, groups, fields), mimetype="application/x-ndjson")
+
+        offset = 0
+        cursor = request.args.get("cursor")
+        if cursor:
+            version, offset = decode_cursor(cursor)
+            if version != catalogue.version:
+                raise APIError("the catalogue changed since this cursor was issued; restart the listing", 410)
+
+        limit = self._limit()
+        total = sum(end - start for _, _, _, start, end in groups)
+        rows = catalogue.index.group_rows(groups, offset, limit)
+        products = [self._record(catalogue, row, fields) for row in rows]
+        following = offset + len(products)
+        return jsonify({
+            "version": catalogue.version,
+            "count": total,
+            "products": products,
+            "next": encode_cursor(catalogue.version, following) if following < total else None,
+        })
+
+    def _stream(self, catalogue, groups, fields):
+        # Serialized in batches as the client reads; never holds more than one batch
+        batch = []
+        for row in catalogue.index.group_rows(groups):
+            batch.append(json.dumps(self._record(catalogue, row, fields)))
+            if len(batch) >= STREAM_BATCH:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+    def facets(self):
+        # Counts per category, sector and year. Each facet applies the other two filters but not
+        # its own, so a client can show the alternatives next to the current choice.
+        catalogue = self.current()
+        index = catalogue.index
+        categories, sectors, years = _filter("category"), _filter("sector"), _filter("year")
+
+        def counts(groups, key):
+            totals = {}
+            for group in groups:
+                totals[key(group)] = totals.get(key(group), 0) + group[4] - group[3]
+            return totals
+
+        by_category = counts(index.select_groups(None, sectors, years), lambda group: group[0])
+        by_sector = counts(index.select_groups(categories, None, years), lambda group: group[1])
+        by_year = counts(index.select_groups(categories, sectors, None), lambda group: group[2])
+        return jsonify({
+            "version": catalogue.version,
+            "count": sum(end - start for _, _, _, start, end in index.select_groups(categories, sectors, years)),
+            "facets": {
+                "category": [{"value": index.category_name(slug), "slug": slug, "count": count}
+                             for slug, count in by_category.items()],
+                "sector": [{"value": sector, "count": count} for sector, count in _by_value(by_sector)],
+                "year": [{"value": year, "count": count} for year, count in _by_value(by_year)],
+            },
+        })
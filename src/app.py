@@ -1,40 +1,114 @@
-import dash
-import os
-import pandas as pd
-import openpyxl
-from dash import Dash, html, dcc, Input, Output, State, no_update, callback_context
+# Boot phase timings (see startup.py); created before the other imports so they are timed too
+from startup import LAZY, StartupProfiler
+startup = StartupProfiler()
 
+import dash
+import hmac
+import logging
 import os
-import pandas as pd
-
-
-def load_product_data():
-    # Determine the correct file path dynamically
-    script_dir = os.path.dirname(os.path.abspath(__file__))  # Get the script's directory
-    file_path = os.path.join(script_dir, 'assets', 'products.xlsx')
-
-    print(f"Looking for file at: {file_path}")  # Debugging
-
-    try:
-        # Load the Excel file with openpyxl engine
-        df = pd.read_excel(file_path, engine='openpyxl')
-        print(f"Excel file loaded successfully from {file_path}")
-
-        # Fill missing values and ensure category is string
-        df['Category'] = df['Category'].fillna('Unknown').astype(str)
-        return df.to_dict('records')
-
-    except FileNotFoundError:
-        print(f"Error: File not found at {file_path}")
-        return []  # Return empty list if file is missing
-
-    except Exception as e:
-        print(f"Error loading Excel file: {e}")
-        return []  # Handle any other errors gracefully
+import threading
+from urllib.parse import parse_qs, urlencode
+from flask import jsonify, request
+from markupsafe import escape
+from plotly.io.json import to_json_plotly
+from dash import Dash, html, dcc, Input, Output, State, ALL, ClientsideFunction, Patch, no_update, callback_context
+
+from api import APIError, CatalogueAPI
+from catalogue import ANY, FACETS, link_origin
+from data_version import CatalogueStore
+from http_cache import ResponseLayer
+from image_proxy import DEFAULT_CACHE_DIR, ImageProxy, is_remote
+from images import DEFAULT_MANIFEST, IMAGE_URL_PREFIX, ResponsiveImages
+from instrumentation import Instrumentation, configure_logging
+from layout_cache import LayoutCache
+from link_health import BLOCKED, BROKEN, RESTRICTED, SLOW, LinkHealth
+from search import MIN_PREFIX
+from snapshot import DEFAULT_SNAPSHOT, load_products, tenant_snapshot
+from tenants import DEFAULT_TENANT, TENANTS_DIR, TenantRegistry, discover
+
+startup.mark("imports")
+
+
+# Determine the correct file path dynamically
+script_dir = os.path.dirname(os.path.abspath(__file__))  # Get the script's directory
+# CATALOGUE_FILE points the app at another workbook (e.g. the benchmark's synthetic ones)
+PRODUCTS_FILE = os.environ.get("CATALOGUE_FILE", os.path.join(script_dir, 'assets', 'products.xlsx'))
+
+# Seconds between checks of products.xlsx for changes (0 disables hot-reload)
+RELOAD_INTERVAL = int(os.environ.get("CATALOGUE_RELOAD_INTERVAL", "30"))
+
+# Country-office catalogues (assets/tenants/<name>.xlsx, served under /<name>/) are loaded on
+# first use; least recently used ones are dropped once their snapshots exceed this many MB
+TENANT_BUDGET_MB = int(os.environ.get("CATALOGUE_TENANT_BUDGET_MB", "256"))
+# Country offices loaded at startup instead of on their first request ("all" for every one)
+WARM_TENANTS = os.environ.get("CATALOGUE_WARM_TENANTS", "")
+# Ops endpoints that change a worker's state (POST .../warm) need "Authorization: Bearer <token>"
+# with this token; they are off when it is not set
+OPS_TOKEN = os.environ.get("CATALOGUE_OPS_TOKEN", "")
+
+# STARTUP_MODE=lazy loads the catalogue and warms up in the background after import, so the
+# worker (and /healthz) is up sooner; other requests wait for it, up to STARTUP_TIMEOUT seconds
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "eager")
+STARTUP_TIMEOUT = int(os.environ.get("STARTUP_TIMEOUT", "60"))
+
+# Remote card images (Image_URL) are served resized through /images/proxy from an on-disk cache
+# of at most this many MB, shared by the workers (IMAGE_PROXY=0 links the originals instead)
+IMAGE_PROXY_ENABLED = os.environ.get("IMAGE_PROXY", "1") != "0"
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR)
+IMAGE_CACHE_MB = int(os.environ.get("IMAGE_CACHE_MB", "256"))
+
+# Product links (the iframe sources) are checked in the background every LINK_CHECK_INTERVAL
+# seconds and flagged in the title dropdowns; LINK_CHECK_HIDE=1 leaves out the ones that are
+# down instead. Off by default (0), so dev runs, tests and scripts importing the app never
+# probe the external hosts; the deployment turns it on (render.yaml).
+LINK_CHECK_INTERVAL = int(os.environ.get("LINK_CHECK_INTERVAL", "0"))
+LINK_CHECK_CONCURRENCY = int(os.environ.get("LINK_CHECK_CONCURRENCY", "16"))
+LINK_CHECK_HIDE = os.environ.get("LINK_CHECK_HIDE", "0") == "1"
+
+# Hosts of the product links the page shell preconnects to (the most used ones, and the
+# deep-linked product's first), and how many more only get a DNS prefetch
+PRECONNECT_ORIGINS = 4
+DNS_PREFETCH_ORIGINS = 8
+
+# Max number of serialized page layouts kept per worker (0 disables the cache)
+LAYOUT_CACHE_SIZE = int(os.environ.get("LAYOUT_CACHE_SIZE", "256"))
+
+# Number of type-ahead search results shown
+SEARCH_RESULTS = 8
+
+# Homepage cards sent per page ("Show more" loads the next page)
+CARDS_PER_PAGE = 12
+
+# Results per page on the browse page (/browse); "Show more" loads the next page
+BROWSE_PAGE_SIZE = 24
+
+# Options sent per dropdown; the rest are loaded as the user types
+OPTION_LIMIT = 100
+
+# Callback metrics on /metrics and Server-Timing headers (METRICS=0 turns them off)
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+
+# LOG_LEVEL (default INFO) and LOG_FORMAT=text|json, unless the importing process already set up
+# logging; per-request logging is DEBUG only
+configure_logging()
+logger = logging.getLogger("catalogue")
+
+
+def read_product_data(file_path, snapshot_path=DEFAULT_SNAPSHOT):
+    # Load from the compiled snapshot, falling back to the Excel file (raises on failure)
+    return load_products(file_path, snapshot_path)
+
+
+class CatalogueApp(dash.Dash):
+    def interpolate_index(self, **kwargs):
+        # Resource hints come first in <head>, so the browser sets up the connection to the
+        # product iframe's host while the app is still loading
+        kwargs["metas"] = page_resource_hints() + kwargs.get("metas", "")
+        return super().interpolate_index(**kwargs)
 
 
 # Create Dash app
-app = dash.Dash(
+app = CatalogueApp(
     __name__,
     external_stylesheets=['/assets/style.css'],  # Dash automatically serves files from 'assets' folder
     suppress_callback_exceptions=True
@@ -44,25 +118,60 @@ app = dash.Dash(
 server = app.server
 app.title = "iMMAP Product Catalogue"
 
-# Load products from Excel
-products = load_product_data()
+# Requests made by the warm-up itself (they must not wait for it)
+WARM_UP_ENVIRON = {"catalogue.warm_up": True}
 
-# Get unique categories from the data
-categories = list(set([product["Category"].lower().replace(" ", "-") for product in products]))
 
-# # Get unique sector values for the first dropdown
-# unique_sectors = df['Sector'].unique()
+@server.before_request
+def wait_until_ready():
+    # Lazy startup: requests wait for the warm-up; the health check, metrics and assets do not
+    if startup.ready.is_set() or request.environ.get("catalogue.warm_up"):
+        return None
+    if request.path in ("/healthz", "/metrics") or request.path.startswith(("/assets/", "/_dash-component-suites/")):
+        return None
+    if not startup.ready.wait(STARTUP_TIMEOUT):
+        return jsonify({"status": "starting"}), 503, {"Retry-After": "5"}
+    return None
 
 
-# Prepare homepage product catalog (keeps all products complete)
-product_catalog = [
-    {
-        "title": cat.replace("-", " ").title(),
-        "image_url": next((p["Image_URL"] for p in products if p["Category"].lower().replace(" ", "-") == cat), ""),
-        "link": f"/{cat}"
-    }
-    for cat in categories
-]
+def warm_serializer():
+    # Dash serializes responses through orjson, which imports numpy the first time it meets a
+    # component object. Now that pandas is no longer imported up front, two request threads
+    # could race on that import and crash a gthread worker, so trigger it once while loading.
+    to_json_plotly(html.Div(html.Div()))
+
+
+if STARTUP_MODE != LAZY:
+    warm_serializer()
+startup.mark("dash app")
+
+
+def make_store(tenant, file_path):
+    # The store swaps in a new snapshot whenever the tenant's workbook changes. In lazy mode the
+    # default catalogue is loaded by the warm-up thread instead of while importing.
+    store = CatalogueStore(file_path, lambda path: read_product_data(path, tenant_snapshot(tenant)),
+                           poll_interval=RELOAD_INTERVAL, base_path=f"/{tenant}" if tenant else "",
+                           load=bool(tenant) or STARTUP_MODE != LAZY)
+    store.start()
+    return store
+
+
+# One catalogue per country office plus the default one (products.xlsx at the root paths),
+# which is loaded right away and never evicted
+tenants = TenantRegistry(dict(discover(TENANTS_DIR), **{DEFAULT_TENANT: PRODUCTS_FILE}), make_store,
+                         max_bytes=TENANT_BUDGET_MB * 1024 * 1024)
+catalogue_store = tenants.store(DEFAULT_TENANT)
+if STARTUP_MODE != LAZY:
+    startup.mark("catalogue")
+
+# Serialized homepage/category pages keyed by (country office, data version, page, selection)
+layout_cache = LayoutCache(max_entries=LAYOUT_CACHE_SIZE)
+
+# Call counts, latency, payload size and errors of the server-side callbacks
+instrumentation = Instrumentation(enabled=METRICS_ENABLED)
+
+# # Get unique sector values for the first dropdown
+# unique_sectors = df['Sector'].unique()
 
 # Carousel images
 carousel_images = [
@@ -72,147 +181,180 @@ carousel_images = [
     "/assets/image4.jpg"
 ]
 
-# Layout for the app
-app.layout = html.Div(
-    [
-        dcc.Location(id='url', refresh=False),
+# Resized AVIF/WebP/JPEG variants from the image build step (python src/images.py)
+responsive_images = ResponsiveImages()
+
+
+def nav_links(catalogue, pathname=None, browse=True):
+    # Home, Browse and one link per category of the page's catalogue, the current page marked active
+    home = catalogue.base_path or "/"
+    links = [("Home", home, "home")]
+    if browse:
+        links.append(("Browse", f"{catalogue.base_path}/{BROWSE_PAGE}", "browse-all"))
+    links += [(product["title"], product["link"], product["link"].strip("/")) for product in catalogue.product_catalog]
+    return [
+        html.A(title, href=href, className="nav-link active" if href == pathname else "nav-link",
+               id={"type": "nav-link", "index": index})
+        for title, href, index in links
+    ]
 
-        # Store components to track carousel index and fade trigger
-        dcc.Store(id='carousel-index', data=0),
-        # html.Link(rel='stylesheet', href='/assets/style.css'),
-        # Top Bar
-        html.Div(
-            [
-                html.Div(
-                    [
 
-                        html.Div(
-                            "iMMAP Inc Product Catalogue",
-                            className="top-bar-title",
-                            style={"textAlign": "center", "fontSize": "24px", "fontWeight": "bold", "flexGrow": "1"}
-                        ),
-                        html.Div(
-                            [
-                                html.A("Email us: nigeria@immap.org", href="mailto:nigeria@immap.org", className="top-bar-link",
-                                       style={"fontSize": "8px", "fontWeight": "normal"}),
-                                html.Div("Call us: (258) 84 564 5353", className="top-bar-text",
-                                         style={"marginTop": "5px", "fontSize": "8px", "fontWeight": "normal"})
-                            ],
-                            className="top-bar-contact",
-                            style={"display": "flex", "flexDirection": "column", "alignItems": "center"}
+# Layout for the app; the nav and page content are filled in for the URL's catalogue
+def serve_layout():
+    return html.Div(
+        [
+            dcc.Location(id='url', refresh=False),
+
+            # Store components to track carousel index and fade trigger
+            dcc.Store(id='carousel-index', data=0),
+            # [country office, data version] of the catalogue the nav was built for
+            dcc.Store(id='nav-catalogue'),
+            # html.Link(rel='stylesheet', href='/assets/style.css'),
+            # Top Bar
+            html.Div(
+                [
+                    html.Div(
+                        [
+
+                            html.Div(
+                                "iMMAP Inc Product Catalogue",
+                                className="top-bar-title",
+                                style={"textAlign": "center", "fontSize": "24px", "fontWeight": "bold", "flexGrow": "1"}
+                            ),
+                            html.Div(
+                                [
+                                    html.A("Email us: nigeria@immap.org", href="mailto:nigeria@immap.org", className="top-bar-link",
+                                           style={"fontSize": "8px", "fontWeight": "normal"}),
+                                    html.Div("Call us: (258) 84 564 5353", className="top-bar-text",
+                                             style={"marginTop": "5px", "fontSize": "8px", "fontWeight": "normal"})
+                                ],
+                                className="top-bar-contact",
+                                style={"display": "flex", "flexDirection": "column", "alignItems": "center"}
+                            ),
+                        ],
+                        className="top-bar-content",
+                        style={"display": "flex", "alignItems": "center", "justifyContent": "space-between",
+                               "width": "100%"}
+                    ),
+                ],
+                className="top-bar",
+            ),
+
+            # Logo and Navigation with active tab handling via Dash callback
+            html.Div(
+                [
+                    html.Div(
+                        html.Img(
+                            src="/assets/immap_usaid_logo.png",
+                            alt="iMMAP and USAID Logo",
+                            className="logo"
                         ),
-                    ],
-                    className="top-bar-content",
-                    style={"display": "flex", "alignItems": "center", "justifyContent": "space-between",
-                           "width": "100%"}
-                ),
-            ],
-            className="top-bar",
-        ),
-
-        # Logo and Navigation with active tab handling via Dash callback
-        html.Div(
-            [
-                html.Div(
-                    html.Img(
-                        src="/assets/immap_usaid_logo.png",
-                        alt="iMMAP and USAID Logo",
-                        className="logo"
+                        className="logo-container",
                     ),
-                    className="logo-container",
-                ),
-                html.Div(
-                    id="nav-menu",
-                    children=[
-                        html.A("Home", href="/", className="nav-link", id="nav-home"),
-                        *[
-                            html.A(
-                                product["title"],
-                                href=product["link"],
-                                className="nav-link",
-                                id=f"nav-{product['link'].strip('/')}"
-                            )
-                            for product in product_catalog
-                        ],
-                    ],
-                    className="nav-links",
-                ),
-            ],
-            className="logo-nav-bar",
-        ),
-
-        # Dynamic content container
-        html.Div(id='page-content', className="content"),
-
-        # Footer (Unchanged)
-        html.Footer(
-            [
-                html.Div(
-                    [
-                        html.P("Copyright © 2025. Developed by iMMAP Inc."),
-                        html.Div(
-                            [
-                                html.A(
-                                    html.Img(
-                                        src="/assets/twitter-icon.png",
-                                        alt="Twitter",
-                                        className="social-icon"
+                    html.Div(
+                        id="nav-menu",
+                        children=[],  # nav_links() of the page's catalogue, set by update_page_content
+                        className="nav-links",
+                    ),
+                ],
+                className="logo-nav-bar",
+            ),
+
+            # Product search (type-ahead results link straight to the product's page)
+            html.Div(
+                [
+                    dcc.Input(
+                        id="search-input",
+                        type="search",
+                        placeholder="Search products...",
+                        autoComplete="off",
+                        debounce=False,
+                        className="search-input",
+                    ),
+                    html.Div(id="search-results", className="search-results"),
+                ],
+                className="search-bar",
+            ),
+
+            # Dynamic content container
+            html.Div(id='page-content', className="content"),
+
+            # Footer (Unchanged)
+            html.Footer(
+                [
+                    html.Div(
+                        [
+                            html.P("Copyright © 2025. Developed by iMMAP Inc."),
+                            html.Div(
+                                [
+                                    html.A(
+                                        html.Img(
+                                            src="/assets/twitter-icon.png",
+                                            alt="Twitter",
+                                            className="social-icon"
+                                        ),
+                                        href="https://twitter.com/iMMAP_Inc",
+                                        target="_blank",
+                                        className="social-link"
                                     ),
-                                    href="https://twitter.com/iMMAP_Inc",
-                                    target="_blank",
-                                    className="social-link"
-                                ),
-                                html.A(
-                                    html.Img(
-                                        src="/assets/youtube-icon.png",
-                                        alt="YouTube",
-                                        className="social-icon"
+                                    html.A(
+                                        html.Img(
+                                            src="/assets/youtube-icon.png",
+                                            alt="YouTube",
+                                            className="social-icon"
+                                        ),
+                                        href="https://www.youtube.com/channel/UCA2uVXRWcJOkNcOD0svYxOg",
+                                        target="_blank",
+                                        className="social-link"
                                     ),
-                                    href="https://www.youtube.com/channel/UCA2uVXRWcJOkNcOD0svYxOg",
-                                    target="_blank",
-                                    className="social-link"
-                                ),
-                                html.A(
-                                    html.Img(
-                                        src="/assets/linkedin-icon.png",
-                                        alt="LinkedIn",
-                                        className="social-icon"
+                                    html.A(
+                                        html.Img(
+                                            src="/assets/linkedin-icon.png",
+                                            alt="LinkedIn",
+                                            className="social-icon"
+                                        ),
+                                        href="https://www.linkedin.com/company/immap",
+                                        target="_blank",
+                                        className="social-link"
                                     ),
-                                    href="https://www.linkedin.com/company/immap",
-                                    target="_blank",
-                                    className="social-link"
-                                ),
-                                html.A(
-                                    html.Img(
-                                        src="/assets/facebook-icon.png",
-                                        alt="Facebook",
-                                        className="social-icon"
+                                    html.A(
+                                        html.Img(
+                                            src="/assets/facebook-icon.png",
+                                            alt="Facebook",
+                                            className="social-icon"
+                                        ),
+                                        href="https://www.facebook.com/immap.org/",
+                                        target="_blank",
+                                        className="social-link"
                                     ),
-                                    href="https://www.facebook.com/immap.org/",
-                                    target="_blank",
-                                    className="social-link"
-                                ),
-                            ],
-                            className="social-links",
-                        ),
-                    ],
-                    className="footer-content",
-                ),
-            ],
-            className="footer",
-        )
+                                ],
+                                className="social-links",
+                            ),
+                        ],
+                        className="footer-content",
+                    ),
+                ],
+                className="footer",
+            )
+
+        ],
+        className="container",
+    )
 
-    ],
-    className="container",
-)
 
+app.layout = serve_layout
 
-# Homepage layout (keeping all products)
-def homepage():
+
+# Homepage layout (keeping all products); `cards=None` renders every card up front
+def homepage(catalogue=None, cards=CARDS_PER_PAGE):
+    catalogue = catalogue or catalogue_store.current()
+    product_catalog = catalogue.product_catalog
+    cards = len(product_catalog) if cards is None else cards
     return html.Div([
         # Store components (Ensuring presence for callback reference)
         dcc.Store(id='carousel-index', data=0),
         dcc.Store(id='fade-trigger', data=False),
+        dcc.Store(id='carousel-images', data=[responsive_images.sources(src) for src in carousel_images]),
 
         # Carousel Section
         html.Div(
@@ -221,9 +363,11 @@ def homepage():
                 html.Div(
                     id="carousel-wrapper",
                     children=[
-                        html.Img(
+                        responsive_images.picture(
+                            carousel_images[0],
+                            sizes="100vw",
                             id="carousel-image",
-                            src=carousel_images[0],
+                            source_ids={"avif": "carousel-source-avif", "webp": "carousel-source-webp"},
                             className="carousel-image fade"
                         )
                     ],
@@ -253,49 +397,168 @@ def homepage():
             className="carousel",
         ),
 
-        # Product Catalogue Section
+        # Product Catalogue Section (first page of cards; the rest load on "Show more")
         html.Div(
             [
                 html.H2("Product Catalogue", className="section-heading"),
                 html.Div(
-                    [
-                        html.Div(
-                            [
-                                html.Img(src=product["image_url"], className="course-image"),
-                                html.H4(product["title"], className="course-title"),
-                                html.A("View Products", href=product["link"], className="course-link"),
-                            ],
-                            className="course-card",
-                        )
-                        for product in product_catalog
-                    ],
+                    [course_card(catalogue, product) for product in product_catalog[:cards]],
+                    id="course-row",
                     className="course-row",
                 ),
+                dcc.Store(id="course-shown", data={"version": catalogue.version,
+                                                   "shown": min(cards, len(product_catalog))}),
+                html.Button("Show more", id="course-more", n_clicks=0, className="course-more",
+                            style=more_button_style(len(product_catalog) > cards)),
             ],
             className="promoted-courses-section",
         ),
     ], className="homepage-content")
 
 
+def course_card(catalogue, product):
+    return html.Div(
+        [
+            card_image(catalogue, product["image_url"]),
+            html.H4(product["title"], className="course-title"),
+            html.A("View Products", href=product["link"], className="course-link"),
+        ],
+        className="course-card",
+    )
+
+
+def card_image(catalogue, src):
+    # Remote images go through the thumbnail proxy (?tenant= lets it check the office's catalogue);
+    # local /assets/ images use their build-time derivatives
+    if not IMAGE_PROXY_ENABLED or not is_remote(src):
+        return responsive_images.picture(src, sizes="240px", className="course-image")
+    tenant = catalogue.base_path.strip("/")
+    return html.Img(src=image_proxy.url(src, tenant=tenant), srcSet=image_proxy.srcset(src, tenant=tenant),
+                    sizes="240px", className="course-image")
+
+
+def more_button_style(visible):
+    return None if visible else {"display": "none"}
+
+
+# Iframe page shown until a full selection is made
+LOADING_PAGE = "/assets/loading.html"
+
+# Value of the disabled "more options" hint at the end of a truncated dropdown
+MORE_OPTIONS = "__more__"
+
+
+def dropdown_options(values, selected=None, search=None, limit=OPTION_LIMIT):
+    # At most `limit` options matching the typed text; the selected value is always kept
+    # so the dropdown can still show it, and a disabled hint says how many more there are
+    needle = str(search).casefold() if search else None
+    shown = []
+    matches = 0
+    for value in values:
+        if needle is not None and needle not in str(value).casefold():
+            continue
+        matches += 1
+        if len(shown) < limit:
+            shown.append(value)
+    if selected is not None and selected not in shown and selected in values:
+        shown.append(selected)
+    options = [{"label": value, "value": value} for value in shown]
+    if matches > limit:
+        options.append({"label": f"Type to search {matches - limit} more...", "value": MORE_OPTIONS,
+                        "disabled": True})
+    return options
+
+
+# Dropdown note and about-panel notice per link problem found by the link checker
+LINK_FLAGS = {
+    BROKEN: ("link down", "This product's link did not respond at the last checks."),
+    RESTRICTED: ("sign-in needed", "This product's page may ask you to sign in."),
+    BLOCKED: ("can't be shown here", "This product's page does not allow being shown inside the catalogue."),
+    SLOW: ("slow", "This product's page was slow to respond at the last check."),
+}
+
+
+def title_options(index, category, sector, year, titles, selected=None, search=None):
+    # Title dropdown options with a note on products whose link has a problem; with
+    # LINK_CHECK_HIDE, links that are down are left out (unless selected)
+    if not link_health.results:
+        return dropdown_options(titles, selected, search)
+    urls = dict(zip(titles, index.urls_for(category, sector, year)))
+    if LINK_CHECK_HIDE:
+        titles = [title for title in titles if title == selected or not link_health.is_down(urls.get(title))]
+    options = dropdown_options(titles, selected, search)
+    for option in options:
+        problem = link_health.problem(urls.get(option["value"]))
+        if problem:
+            option["label"] = f"{option['label']} ({LINK_FLAGS[problem][0]})"
+    return options
+
+
+def resolve_search(catalogue, category, search):
+    # Resolve the ?sector=&year=&title= query string against the catalogue
+    query = parse_qs((search or "").lstrip("?"))
+    return catalogue.index.resolve(
+        category,
+        sector=query.get("sector", [None])[0],
+        year=query.get("year", [None])[0],
+        title=query.get("title", [None])[0],
+    )
+
+
+def page_query(sector, year, title):
+    # Encode a selection as ?sector=..&year=..&title=.. for deep links
+    params = [(key, value) for key, value in (("sector", sector), ("year", year), ("title", title))
+              if value is not None]
+    return f"?{urlencode(params)}" if params else ""
+
+
+def selection_query(selection):
+    return page_query(selection.sector, selection.year, selection.title)
+
+
+def product_link(catalogue, product):
+    # Deep link to a single product's category page; a catalogue product's own values are
+    # valid dropdown options, so there is nothing to resolve (this runs per row in API exports)
+    return (f"{catalogue.base_path}/{catalogue.index.slug(product['Category'])}"
+            f"{page_query(product['Sector'], product['Year'], product['Title'])}")
+
+
+def product_about(product):
+    # Floating "About Product" content for a resolved product
+    if product:
+        return html.Div([
+            html.H3("About This Product", className="floating-title"),
+            html.P(product.get('Description') or 'No description available.', className="floating-text"),
+            link_notice(product.get('URL')),
+        ])
+    return html.P("Select all filters to see product information.", className="floating-text")
+
+
+def link_notice(url):
+    # Why the iframe may stay blank, with a way out; None while the link looks fine
+    problem = link_health.problem(url)
+    if not problem:
+        return None
+    return html.P([LINK_FLAGS[problem][1] + " ",
+                   html.A("Open it in a new tab", href=url, target="_blank", rel="noopener")],
+                  className="floating-text link-notice")
+
+
 # Product pages with dropdown selection
-def product_page(category):
-    formatted_category = category.lower().replace(" ", "-")
-    # products_for_category = [
-    #     p for p in products if p["Category"].lower().replace(" ", "-") == formatted_category
-    # ]
-    products_for_category = list({p["Sector"]: p for p in products
-                                  if p["Category"].lower().replace(" ", "-") == formatted_category}.values())
-
-    if products_for_category:
-        # Get options for the dropdowns
-        titles = sorted(set([p["Title"] for p in products_for_category]))
-        sectors = sorted(set([p["Sector"] for p in products_for_category]))
-        years = sorted(set([p["Year"] for p in products_for_category]))
+def product_page(category, catalogue=None, search=None):
+    catalogue = catalogue or catalogue_store.current()
+    section_head = catalogue.index.category_name(category)
+
+    # Resolve the whole selection up front (from ?sector=&year=&title= when present),
+    # so the page renders in its final state without follow-up callbacks
+    selection = resolve_search(catalogue, category, search)
+
+    if selection.sectors:
         return html.Div([
             # Store section-head (category) in a hidden store within the function
-            dcc.Store(id='stored-section-head', data=products_for_category[0]["Category"]),
+            dcc.Store(id='stored-section-head', data=section_head),
 
-            html.H2(products_for_category[0]["Category"], className="section-heading"),
+            html.H2(section_head, className="section-heading"),
 
         # Product selection dropdown
         html.Div([
@@ -303,8 +566,8 @@ def product_page(category):
                 html.Label("Sector:", className="dropdown-label"),
                 dcc.Dropdown(
                     id="sector-dropdown",
-                    options=[{"label": p["Sector"], "value": p["Sector"]} for p in products_for_category],
-                    value=sectors[0],
+                    options=dropdown_options(selection.sectors, selection.sector),
+                    value=selection.sector,
                     placeholder="Select Sector",
                     style={'width': '250px'}
                 ),
@@ -314,10 +577,11 @@ def product_page(category):
                 html.Label("Year:", className="dropdown-label"),
                 dcc.Dropdown(
                     id="year-dropdown",
+                    options=dropdown_options(selection.years, selection.year),
                     placeholder="Select Year",
-                    disabled=True,  # Initially disabled
+                    disabled=not selection.years,
                     style={'width': '250px'},
-                    value=years[0],
+                    value=selection.year,
                 ),
             ], className="dropdown-container"),
 
@@ -325,114 +589,429 @@ def product_page(category):
                 html.Label("Product Title:", className="dropdown-label"),
                 dcc.Dropdown(
                     id="product-dropdown",
+                    options=title_options(catalogue.index, category, selection.sector, selection.year,
+                                          selection.titles, selection.title),
                     placeholder="Select Product Title",
-                    disabled=True,  # Initially disabled
-                    value=titles[0],
+                    disabled=not selection.titles,
+                    value=selection.title,
                     style={'width': '250px'}
                 ),
             ], className="dropdown-container"),
         ], className="dropdown-row", style={'display': 'flex', 'gap': '20px', 'alignItems': 'center'}),
 
-            html.Iframe(id="product-iframe", style={'width': '100%', 'height': '80vh', 'border': 'none'}),
+            html.Iframe(id="product-iframe",
+                        src=selection.product['URL'] if selection.product else LOADING_PAGE,
+                        style={'width': '100%', 'height': '80vh', 'border': 'none'}),
 
             # Return link
-            html.Div(html.A("← Return to Homepage", href="/", className="back-link"),
+            html.Div(html.A("← Return to Homepage", href=catalogue.base_path or "/", className="back-link"),
                      style={'textAlign': 'center', 'marginTop': '20px'}),
 
             # Floating "About Product" section
-            html.Div(id="floating-about", className="floating-about")
+            html.Div(product_about(selection.product), id="floating-about", className="floating-about")
         ])
 
-    return homepage()
+    return homepage(catalogue)
 
 
-# Callback to update page content when clicking "View Products"
-@app.callback(
-    Output('page-content', 'children'),
-    Input('url', 'pathname')
-)
-def update_page_content(pathname):
-    print(f"Current URL Pathname: {pathname}")
-    category = pathname.strip("/")
-    if category in [p["link"].strip("/") for p in product_catalog]:
-        return product_page(category)
+# Path of the faceted browse page (a category with this slug keeps its own page)
+BROWSE_PAGE = "browse"
 
-    return homepage()
+# Labels and placeholders of the browse page's facet dropdowns
+FACET_LABELS = {"category": ("Category:", "All categories"),
+                "sector": ("Sector:", "All sectors"),
+                "year": ("Year:", "All years")}
 
-@app.callback(
-    Output('product-iframe', 'src'),
-    [
-        Input('sector-dropdown', 'value'),
-        Input('year-dropdown', 'value'),
-        Input('product-dropdown', 'value')
-    ],
-    [State('stored-section-head', 'data')]  # Retrieve section-head from store
-)
-def update_product_page(selected_sector, selected_year, selected_product, selected_section_head):
-    # If any dropdown (sector, year, product) or section-head is not selected, return default URL
-    if not selected_product or not selected_sector or not selected_year or not selected_section_head:
-        return "/assets/loading.html"  # Default URL when no valid selection is made
-
-    # Proceed to filter and set iframe URL if all selections are made
-    filtered_data = [
-        p for p in products
-        if p['Title'] == selected_product and
-           p['Sector'] == selected_sector and
-           p['Year'] == selected_year and
-           p['Category'] == selected_section_head
-    ]
 
-    # If a matching entry is found, return the URL for the iframe
-    if filtered_data:
-        return filtered_data[0]['URL']
+def browse_filters(catalogue, category=None, sector=None, year=None):
+    # Dropdown or query-string values -> (category slug, sector, year) key of the facet cube,
+    # with ANY for unset or unknown values
+    cube = catalogue.index.cube
+    if category is not None and category != "":
+        category = catalogue.index.slug(category)
+    return cube.match("category", category), cube.match("sector", sector), cube.match("year", year)
 
-    # If no valid selection or no match is found, return a default URL with no data
-    return "/assets/loading.html"  # Default URL when no valid data is available
 
+def browse_search_filters(catalogue, search):
+    # Filters from the ?category=&sector=&year= query string
+    query = parse_qs((search or "").lstrip("?"))
+    return browse_filters(catalogue, *(query.get(facet, [None])[0] for facet in FACETS))
 
 
-# Callback to update the year and title dropdowns based on selected sector
-@app.callback(
-    [Output('year-dropdown', 'options'),
-     Output('year-dropdown', 'disabled')],
-    [Input('sector-dropdown', 'value')],
-    [State('stored-section-head', 'data')]  # Retrieve section-head from store
-)
-def update_year_dropdown(selected_sector, selected_section_head):
-    if selected_sector and selected_section_head:
-        filtered_years = sorted(set(
-            p['Year'] for p in products
-            if p['Sector'] == selected_sector and p['Category'] == selected_section_head
-        ))
-        return [{'label': year, 'value': year} for year in filtered_years], False
+def browse_query(filters):
+    params = [(facet, value) for facet, value in zip(FACETS, filters) if value is not ANY]
+    return f"?{urlencode(params)}" if params else ""
 
-    return [], True  # Disable the dropdown if no sector or section-head is selected
 
+def filter_values(filters):
+    # ANY -> None, for the dropdown values and the results store
+    return [None if value is ANY else value for value in filters]
 
 
-# Callback to update the title dropdown based on selected year
-@app.callback(
-    [Output('product-dropdown', 'options'),
-     Output('product-dropdown', 'disabled')],
-    [Input('sector-dropdown', 'value'),
-     Input('year-dropdown', 'value')],
-    [State('stored-section-head', 'data')]  # Retrieve section-head from store
-)
-def update_product_dropdown(selected_sector, selected_year, selected_section_head):
-    if selected_sector and selected_year and selected_section_head:
-        filtered_titles = sorted(set(
-            p['Title'] for p in products
-            if p['Sector'] == selected_sector and p['Year'] == selected_year and p['Category'] == selected_section_head
-        ))
-        return [{'label': title, 'value': title} for title in filtered_titles], False
+def facet_options(catalogue, facet, filters):
+    # Each value with its product count under the other two filters (from the precomputed cube);
+    # values without products are left out, unless selected
+    selected = filters[FACETS.index(facet)]
+    options = []
+    for value, count in catalogue.index.cube.facet(facet, filters):
+        if count or value == selected:
+            label = catalogue.index.category_name(value) if facet == "category" else value
+            options.append({"label": f"{label} ({count})", "value": value})
+    return options
+
 
-    return [], True  # Disable the dropdown if no sector, year, or section-head is selected
+def result_count(total):
+    return f"{total} product" if total == 1 else f"{total} products"
 
 
+def browse_results(catalogue, filters, start, end):
+    # Products start..end of the filtered listing, in index order (category, sector, year, title)
+    groups = catalogue.index.select_groups(*(None if value is ANY else [value] for value in filters))
+    rows = catalogue.index.group_rows(groups, start, end - start)
+    return [result_link(catalogue, catalogue.products[row]) for row in rows]
+
+
+def browse_page(catalogue, search=None):
+    filters = browse_search_filters(catalogue, search)
+    values = filter_values(filters)
+    total = catalogue.index.cube.count(*filters)
+    shown = min(BROWSE_PAGE_SIZE, total)
+
+    def facet_dropdown(facet, value):
+        label, placeholder = FACET_LABELS[facet]
+        return html.Div([
+            html.Label(label, className="dropdown-label"),
+            dcc.Dropdown(
+                id=f"facet-{facet}",
+                options=facet_options(catalogue, facet, filters),
+                value=value,
+                placeholder=placeholder,
+                style={'width': '250px'}
+            ),
+        ], className="dropdown-container")
+
+    return html.Div([
+        html.H2("Browse the catalogue", className="section-heading"),
+
+        # Independent filters: each lists its values with the counts under the other two
+        html.Div([facet_dropdown(facet, value) for facet, value in zip(FACETS, values)],
+                 className="dropdown-row", style={'display': 'flex', 'gap': '20px', 'alignItems': 'center'}),
+
+        html.P(result_count(total), id="facet-count", className="facet-count"),
+        html.Div(browse_results(catalogue, filters, 0, shown), id="facet-results", className="facet-results"),
+        dcc.Store(id="facet-shown", data={"version": catalogue.version, "filters": values, "shown": shown}),
+        html.Button("Show more", id="facet-more", n_clicks=0, className="course-more",
+                    style=more_button_style(shown < total)),
+
+        html.Div(html.A("← Return to Homepage", href=catalogue.base_path or "/", className="back-link"),
+                 style={'textAlign': 'center', 'marginTop': '20px'}),
+    ], className="browse-page")
+
+
+def split_tenant(pathname):
+    # "/nigeria/maps" -> ("nigeria", "maps"); paths without a known country-office prefix belong
+    # to the default catalogue (so a tenant named like a category would shadow that category)
+    parts = (pathname or "").strip("/").split("/", 1)
+    if parts[0] != DEFAULT_TENANT and parts[0] in tenants:
+        return parts[0], parts[1] if len(parts) > 1 else ""
+    return DEFAULT_TENANT, (pathname or "").strip("/")
+
+
+def page_catalogue(pathname):
+    return tenants.current(split_tenant(pathname)[0])
+
+
+def page_resource_hints():
+    # Resource hints for the page being loaded (the product of a category page's query string)
+    tenant, category = split_tenant(request.path)
+    try:
+        catalogue = tenants.current(tenant)
+    except KeyError:
+        return ""
+    product = None
+    if catalogue.index.has_category(category):
+        product = resolve_search(catalogue, category, request.query_string.decode("utf-8", "replace")).product
+    return resource_hints(catalogue, product)
+
+
+def resource_hints(catalogue, product=None):
+    # <link> preconnect/dns-prefetch tags: the host of the product the page's iframe will show,
+    # then the hosts most product links point to
+    origins = [origin for origin, _ in catalogue.link_origins]
+    origin = link_origin(product.get("URL")) if product else None
+    if origin:
+        origins = [origin] + [other for other in origins if other != origin]
+    tags = [f'<link rel="preconnect" href="{escape(origin)}">' for origin in origins[:PRECONNECT_ORIGINS]]
+    tags += [f'<link rel="dns-prefetch" href="{escape(origin)}">'
+             for origin in origins[:PRECONNECT_ORIGINS + DNS_PREFETCH_ORIGINS]]
+    return "\n      ".join(tags) + "\n      " if tags else ""
+
+
+def page_layout(tenant, catalogue, category, search=None):
+    if catalogue.index.has_category(category):
+        # Keyed on the resolved selection, so equivalent query strings share one entry, and on
+        # the last link check, whose flags the page shows
+        selection = resolve_search(catalogue, category, search)
+        key = (tenant, catalogue.version, link_health.checked_at, catalogue.index.slug(category),
+               selection.sector, selection.year, selection.title)
+        return layout_cache.get_or_build(key, lambda: product_page(category, catalogue, search))
+
+    if category == BROWSE_PAGE:
+        key = (tenant, catalogue.version, BROWSE_PAGE, browse_search_filters(catalogue, search))
+        return layout_cache.get_or_build(key, lambda: browse_page(catalogue, search))
+
+    return layout_cache.get_or_build((tenant, catalogue.version, None), lambda: homepage(catalogue))
+
+
+# Callback to update page content when clicking "View Products"
+@app.callback(
+    [Output('page-content', 'children'),
+     Output('nav-menu', 'children'),
+     Output('nav-catalogue', 'data')],
+    Input('url', 'pathname'),
+    [State('url', 'search'),  # Deep-linked selection, only read on navigation
+     State('nav-catalogue', 'data')]
+)
+@instrumentation.callback("update_page_content")
+def update_page_content(pathname, search, nav_catalogue):
+    logger.debug("Current URL Pathname: %s", pathname)
+    tenant, category = split_tenant(pathname)
+    catalogue = tenants.current(tenant)
+    page = page_layout(tenant, catalogue, category, search)
+    # The nav only changes with the catalogue (another country office, or a reload); within
+    # one, update_active_nav marks the current link in the browser
+    built_for = [tenant, catalogue.version]
+    if nav_catalogue == built_for:
+        return page, no_update, no_update
+    return page, nav_links(catalogue, pathname), built_for
+
+
+def warm_tenant(tenant):
+    # Load a country office's catalogue and render its homepage into the layout cache
+    page_layout(tenant, tenants.current(tenant), "")
+
+
+# Single callback for the whole filter chain: any dropdown change resolves
+# sector -> year -> title, the iframe, the about panel and the URL in one round trip
+@app.callback(
+    [Output('year-dropdown', 'options'),
+     Output('year-dropdown', 'value'),
+     Output('year-dropdown', 'disabled'),
+     Output('product-dropdown', 'options'),
+     Output('product-dropdown', 'value'),
+     Output('product-dropdown', 'disabled'),
+     Output('product-iframe', 'src'),
+     Output('floating-about', 'children'),
+     Output('url', 'search')],
+    [Input('sector-dropdown', 'value'),
+     Input('year-dropdown', 'value'),
+     Input('product-dropdown', 'value')],
+    [State('stored-section-head', 'data'),  # Retrieve section-head from store
+     State('url', 'pathname')],
+    prevent_initial_call=True  # product_page() already rendered the resolved state
+)
+@instrumentation.callback("update_selection")
+def update_selection(selected_sector, selected_year, selected_product, selected_section_head, pathname):
+    if not selected_section_head:
+        return [], None, True, [], None, True, LOADING_PAGE, product_about(None), ""
 
-# Callback to update the image and re-trigger fade effect
+    # A dropdown the user just cleared stays cleared (and so does everything below it);
+    # otherwise values that no longer apply fall back to the first option
+    triggered = callback_context.triggered
+    cleared = bool(triggered) and triggered[0]['value'] is None
+
+    index = page_catalogue(pathname).index
+    selection = index.resolve(
+        selected_section_head, selected_sector, selected_year, selected_product, fill_missing=not cleared
+    )
+    return (
+        dropdown_options(selection.years, selection.year), selection.year, not selection.years,
+        title_options(index, selected_section_head, selection.sector, selection.year, selection.titles,
+                      selection.title),
+        selection.title, not selection.titles,
+        selection.product['URL'] if selection.product else LOADING_PAGE,
+        product_about(selection.product),
+        selection_query(selection),
+    )
+
+
+# Long option lists are loaded as the user types: only the matching slice is sent
+@app.callback(
+    [Output('sector-dropdown', 'options'),
+     Output('year-dropdown', 'options', allow_duplicate=True),
+     Output('product-dropdown', 'options', allow_duplicate=True)],
+    [Input('sector-dropdown', 'search_value'),
+     Input('year-dropdown', 'search_value'),
+     Input('product-dropdown', 'search_value')],
+    [State('sector-dropdown', 'value'),
+     State('year-dropdown', 'value'),
+     State('product-dropdown', 'value'),
+     State('stored-section-head', 'data'),
+     State('url', 'pathname')],
+    prevent_initial_call=True
+)
+@instrumentation.callback("search_dropdown_options")
+def search_dropdown_options(sector_search, year_search, product_search, sector, year, product, section_head,
+                            pathname):
+    triggered = callback_context.triggered
+    if not section_head or not triggered:
+        return no_update, no_update, no_update
+
+    index = page_catalogue(pathname).index
+    dropdown = triggered[0]['prop_id'].split('.')[0]
+    if dropdown == 'sector-dropdown':
+        return dropdown_options(index.sectors_for(section_head), sector, sector_search), no_update, no_update
+    if dropdown == 'year-dropdown':
+        years = index.years_for(section_head, sector) if sector is not None else []
+        return no_update, dropdown_options(years, year, year_search), no_update
+    titles = index.titles_for(section_head, sector, year) if year is not None else []
+    return no_update, no_update, title_options(index, section_head, sector, year, titles, product, product_search)
+
+
+def shown_state(shown):
+    # A "Show more" store sent back by the client -> (data version, items shown); anything
+    # malformed counts as nothing shown yet
+    if not isinstance(shown, dict):
+        return None, 0
+    count = shown.get("shown")
+    if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+        count = 0
+    return shown.get("version"), count
+
+
+# Next page of homepage cards, appended to the grid without resending the rest
+@app.callback(
+    [Output('course-row', 'children'),
+     Output('course-shown', 'data'),
+     Output('course-more', 'style')],
+    Input('course-more', 'n_clicks'),
+    [State('course-shown', 'data'),
+     State('url', 'pathname')],
+    prevent_initial_call=True
+)
+@instrumentation.callback("load_more_cards")
+def load_more_cards(n_clicks, shown, pathname):
+    catalogue = page_catalogue(pathname)
+    product_catalog = catalogue.product_catalog
+    version, count = shown_state(shown)
+    end = min(count + CARDS_PER_PAGE, len(product_catalog))
+
+    if version == catalogue.version:
+        children = Patch()
+        children.extend([course_card(catalogue, product) for product in product_catalog[count:end]])
+    else:
+        # The catalogue was reloaded since the page was rendered; resend the whole (bounded) grid
+        children = [course_card(catalogue, product) for product in product_catalog[:end]]
+    return children, {"version": catalogue.version, "shown": end}, more_button_style(end < len(product_catalog))
+
+
+# Type-ahead product search
+@app.callback(
+    Output('search-results', 'children'),
+    Input('search-input', 'value'),
+    State('url', 'pathname'),  # searches the catalogue of the page being viewed
+    prevent_initial_call=True
+)
+@instrumentation.callback("update_search_results")
+def update_search_results(query, pathname):
+    if not isinstance(query, str):  # forged callbacks can send any JSON value
+        return []
+    if len(query.strip()) < MIN_PREFIX:  # too short to look anything up: no result list yet
+        return []
+
+    catalogue = page_catalogue(pathname)
+    results = catalogue.search.search(query, limit=SEARCH_RESULTS)
+    if not results:
+        return html.P("No products found.", className="search-empty")
+
+    return [result_link(catalogue, product) for product in results]
+
+
+def result_link(catalogue, product):
+    # One product in the search results and browse listing, linking to its page
+    return html.A(
+        [
+            html.Span(product["Title"], className="search-result-title"),
+            html.Span(f'{product["Category"]} · {product["Sector"]} · {product["Year"]}',
+                      className="search-result-meta"),
+        ],
+        href=product_link(catalogue, product),
+        className="search-result",
+    )
+
+
+# Browse page: any facet change recounts the other facets (cube lookups, independent of the
+# catalogue size) and sends the first page of matching products
+@app.callback(
+    [Output('facet-category', 'options'),
+     Output('facet-sector', 'options'),
+     Output('facet-year', 'options'),
+     Output('facet-count', 'children'),
+     Output('facet-results', 'children'),
+     Output('facet-shown', 'data'),
+     Output('facet-more', 'style'),
+     Output('url', 'search', allow_duplicate=True)],
+    [Input('facet-category', 'value'),
+     Input('facet-sector', 'value'),
+     Input('facet-year', 'value')],
+    State('url', 'pathname'),
+    prevent_initial_call=True  # browse_page() already rendered the filters from the URL
+)
+@instrumentation.callback("update_facets")
+def update_facets(category, sector, year, pathname):
+    catalogue = page_catalogue(pathname)
+    filters = browse_filters(catalogue, category, sector, year)
+    total = catalogue.index.cube.count(*filters)
+    shown = min(BROWSE_PAGE_SIZE, total)
+    return (
+        *(facet_options(catalogue, facet, filters) for facet in FACETS),
+        result_count(total),
+        browse_results(catalogue, filters, 0, shown),
+        {"version": catalogue.version, "filters": filter_values(filters), "shown": shown},
+        more_button_style(shown < total),
+        browse_query(filters),
+    )
+
+
+# Next page of browse results, appended without resending the rest
 @app.callback(
+    [Output('facet-results', 'children', allow_duplicate=True),
+     Output('facet-shown', 'data', allow_duplicate=True),
+     Output('facet-more', 'style', allow_duplicate=True)],
+    Input('facet-more', 'n_clicks'),
+    [State('facet-shown', 'data'),
+     State('url', 'pathname')],
+    prevent_initial_call=True
+)
+@instrumentation.callback("load_more_results")
+def load_more_results(n_clicks, shown, pathname):
+    catalogue = page_catalogue(pathname)
+    version, count = shown_state(shown)
+    filters = shown.get("filters") if isinstance(shown, dict) else None
+    if not isinstance(filters, list) or len(filters) != len(FACETS):
+        filters = [None] * len(FACETS)
+    filters = browse_filters(catalogue, *filters)
+    total = catalogue.index.cube.count(*filters)
+    end = min(count + BROWSE_PAGE_SIZE, total)
+
+    if version == catalogue.version:
+        children = Patch()
+        children.extend(browse_results(catalogue, filters, count, end))
+    else:
+        # The catalogue was reloaded since the page was rendered; resend the whole (bounded) listing
+        children = browse_results(catalogue, filters, 0, end)
+    data = {"version": catalogue.version, "filters": filter_values(filters), "shown": end}
+    return children, data, more_button_style(end < total)
+
+
+# Carousel rotation and fade toggling run in the browser (assets/script.js),
+# so the 5s timer and the prev/next buttons never hit the server
+app.clientside_callback(
+    ClientsideFunction(namespace='catalogue', function_name='update_carousel'),
     [Output('carousel-image', 'src'),
+     Output('carousel-image', 'srcSet'),
+     Output('carousel-source-avif', 'srcSet'),
+     Output('carousel-source-webp', 'srcSet'),
      Output('carousel-image', 'className'),
      Output('carousel-index', 'data'),
      Output('fade-trigger', 'data')],
@@ -440,84 +1019,212 @@ def update_product_dropdown(selected_sector, selected_year, selected_section_hea
      Input('next-btn', 'n_clicks'),
      Input('carousel-timer', 'n_intervals')],
     [State('carousel-index', 'data'),
-     State('fade-trigger', 'data')]
+     State('fade-trigger', 'data'),
+     State('carousel-images', 'data')]
+)
+
+
+# Highlight the nav link matching the current URL, also in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='catalogue', function_name='update_active_nav'),
+    Output({"type": "nav-link", "index": ALL}, 'className'),
+    Input('url', 'pathname'),
+    State({"type": "nav-link", "index": ALL}, 'href')
 )
-def update_carousel(prev_clicks, next_clicks, n_intervals, index, fade_trigger):
-    prev_clicks = prev_clicks or 0
-    next_clicks = next_clicks or 0
-    n_intervals = n_intervals or 0
 
-    triggered = callback_context.triggered
 
-    if not triggered:
-        return carousel_images[index], "carousel-image fade", index, not fade_trigger  # Initial load
+def request_catalogue():
+    # Catalogue picked by ?tenant=<country office> on the JSON endpoints; the default without it
+    tenant = request.args.get("tenant", DEFAULT_TENANT)
+    try:
+        return tenants.current(tenant)
+    except KeyError:
+        raise APIError(f"unknown tenant: {tenant}", 404) from None
 
-    button_id = triggered[0]['prop_id'].split('.')[0]
 
-    if button_id == "next-btn" or button_id == "carousel-timer":
-        index = (index + 1) % len(carousel_images)
-    elif button_id == "prev-btn":
-        index = (index - 1) % len(carousel_images)
+def request_version():
+    try:
+        return request_catalogue().version
+    except APIError:
+        return None
 
-    return carousel_images[
-               index], "carousel-image fade" if not fade_trigger else "carousel-image fade-alt", index, not fade_trigger
 
+# Search endpoint for scripts and other front ends: /catalogue/search?q=flood&limit=10[&tenant=nigeria]
+@server.route("/catalogue/search")
+def catalogue_search():
+    catalogue = request_catalogue()
+    try:
+        limit = min(max(int(request.args.get("limit", SEARCH_RESULTS)), 1), 100)
+    except ValueError:
+        limit = SEARCH_RESULTS
+    results = catalogue.search.search(request.args.get("q", ""), limit=limit)
+    return jsonify({
+        "version": catalogue.version,
+        "results": [dict(product, link=product_link(catalogue, product)) for product in results],
+    })
 
-@app.callback(
-    Output('nav-menu', 'children'),
-    Input('url', 'pathname')
-)
-def update_active_nav(pathname):
-    nav_links = [
-        html.A("Home", href="/", className="nav-link active" if pathname == "/" else "nav-link", id="nav-home"),
-        *[
-            html.A(
-                product["title"],
-                href=product["link"],
-                className="nav-link active" if pathname == product["link"] else "nav-link",
-                id=f"nav-{product['link'].strip('/')}"
-            )
-            for product in product_catalog
-        ]
-    ]
-    return nav_links
 
+# Read-only JSON/NDJSON API for partner dashboards: /api/products and /api/facets
+catalogue_api = CatalogueAPI(request_catalogue, link=product_link)
+catalogue_api.init_app(server)
 
 
-@app.callback(
-    Output('floating-about', 'children'),
-    [Input('product-dropdown', 'value'),
-     Input('sector-dropdown', 'value'),
-     Input('year-dropdown', 'value')],
-    [State('stored-section-head', 'data')]  # Retrieve section-head from store
-)
-def update_product_page(selected_product, selected_sector, selected_year, selected_section_head):
-    # Ensure all required values are selected
-    if not selected_product or not selected_sector or not selected_year or not selected_section_head:
-        return html.P("Select all filters to see product information.", className="floating-text")
-
-    # Filter the product data based on selected values from all dropdowns
-    filtered_data = [
-        p for p in products
-        if p['Title'] == selected_product and
-           p['Sector'] == selected_sector and
-           p['Year'] == selected_year and
-           p['Category'] == selected_section_head
-    ]
+def proxied_image(src):
+    # Only the card images of the requested catalogue are fetched (no open proxy)
+    return src in request_catalogue().index.category_images.values()
 
-    # Get the selected product details
-    selected_product_details = next((p for p in products if p["Title"] == selected_product), None)
 
-    # If a matching entry is found, return product details
-    if filtered_data and selected_product_details:
-        return html.Div([
-            html.H3("About This Product", className="floating-title"),
-            html.P(selected_product_details.get('Description', 'No description available.'), className="floating-text")
-        ])
+# Resized, disk-cached remote card images: /images/proxy?src=<Image_URL>&w=240[&tenant=nigeria]
+image_proxy = ImageProxy(proxied_image, cache_dir=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MB * 1024 * 1024)
+image_proxy.init_app(server)
 
-    # If no match is found, display a message
-    return html.P("Select all filters to see product information.", className="floating-text")
 
+def catalogue_links():
+    # Product links of every catalogue loaded in this worker, for the link checker
+    for store in tenants.loaded():
+        products = store.current().products
+        if "URL" in products.columns:
+            for url, _ in products.value_counts("URL"):
+                yield url
+
+
+# Background health checks of the product links, shared by the workers through build/link-health.json
+link_health = LinkHealth(catalogue_links, interval=LINK_CHECK_INTERVAL, concurrency=LINK_CHECK_CONCURRENCY)
+
+
+# Compression, ETags and Cache-Control for every response. The layout, search results and
+# API responses only change with the catalogue version (or a deploy), so revalidation gets
+# a 304; image derivatives have content-hashed names and are cached for a year.
+response_layer = ResponseLayer(
+    request_version,
+    versioned_paths=["/_dash-layout", "/_dash-dependencies", "/catalogue/search"] + catalogue_api.paths,
+    immutable_prefixes=[IMAGE_URL_PREFIX],
+    build_files=[DEFAULT_MANIFEST],
+)
+response_layer.init_app(server)
+
+# Prometheus metrics and Server-Timing; registered after the response layer so payload
+# sizes are measured before compression
+instrumentation.init_app(server)
+instrumentation.gauge("catalogue_products", "Products in the current catalogue snapshot.",
+                      lambda: catalogue_store.stats()["products"])
+instrumentation.gauge("catalogue_reloads_total", "Catalogue snapshots loaded.",
+                      lambda: catalogue_store.reload_count, kind="counter")
+instrumentation.gauge("catalogue_reload_errors_total", "Failed catalogue reloads.",
+                      lambda: catalogue_store.reload_errors, kind="counter")
+instrumentation.gauge("catalogue_layout_cache_hits_total", "Layout cache hits.",
+                      lambda: layout_cache.stats()["hits"], kind="counter")
+instrumentation.gauge("catalogue_layout_cache_misses_total", "Layout cache misses.",
+                      lambda: layout_cache.stats()["misses"], kind="counter")
+instrumentation.gauge("catalogue_http_not_modified_total", "Requests answered with 304.",
+                      lambda: response_layer.not_modified, kind="counter")
+instrumentation.gauge("catalogue_tenants_loaded", "Country-office catalogues loaded in this worker.",
+                      lambda: tenants.stats()["loaded"])
+instrumentation.gauge("catalogue_tenants_loaded_bytes", "Snapshot bytes of the loaded catalogues.",
+                      lambda: tenants.stats()["loaded_bytes"])
+instrumentation.gauge("catalogue_image_proxy_hits_total", "Card thumbnails served from the disk cache.",
+                      lambda: image_proxy.hits, kind="counter")
+instrumentation.gauge("catalogue_image_proxy_misses_total", "Card thumbnails fetched and resized.",
+                      lambda: image_proxy.misses, kind="counter")
+instrumentation.gauge("catalogue_image_proxy_coalesced_total", "Thumbnail misses that waited for a fetch in progress.",
+                      lambda: image_proxy.coalesced, kind="counter")
+instrumentation.gauge("catalogue_image_proxy_errors_total", "Failed thumbnail fetches.",
+                      lambda: image_proxy.errors, kind="counter")
+instrumentation.gauge("catalogue_links_checked", "Product links with a health check result.",
+                      lambda: len(link_health.results))
+instrumentation.gauge("catalogue_links_down", "Product links that failed their last health checks.",
+                      lambda: link_health.stats()["down"])
+instrumentation.gauge("catalogue_link_check_seconds", "Duration of the last pass of the link checker.",
+                      lambda: link_health.seconds)
+instrumentation.gauge("catalogue_startup_seconds", "Boot time of this worker, until it was warmed up.",
+                      lambda: startup.seconds if startup.ready.is_set() else None)
+
+
+# Liveness and boot phases; answers while the catalogue is still loading. With ?wait=<seconds>
+# it waits for the warm-up and answers 503 if the worker is not ready by then (deploy hooks).
+@server.route("/healthz")
+def healthz():
+    wait = request.args.get("wait", type=float)
+    if wait:
+        startup.ready.wait(min(wait, STARTUP_TIMEOUT))
+    ready = startup.ready.is_set()
+    body = {"status": "ready" if ready else "starting", "mode": STARTUP_MODE, "pid": os.getpid(),
+            "startup": startup.report()}
+    return jsonify(body), 200 if ready or not wait else 503
+
+
+# Current data version and reload counter for monitoring
+@server.route("/catalogue/version")
+def catalogue_version():
+    return jsonify(dict(catalogue_store.stats(), layout_cache=layout_cache.stats(), http=response_layer.stats(),
+                        tenants=tenants.stats(), image_proxy=image_proxy.stats()))
+
+
+# Load state, size, loads/evictions and request counts per country office (in this worker)
+@server.route("/catalogue/tenants")
+def catalogue_tenants():
+    return jsonify(tenants.stats())
+
+
+def ops_authorized():
+    # Whether the request carries the CATALOGUE_OPS_TOKEN (compared in constant time)
+    expected = f"Bearer {OPS_TOKEN}".encode()
+    return bool(OPS_TOKEN) and hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected)
+
+
+# Load a country office ahead of its first visitor: POST /catalogue/tenants/nigeria/warm, with
+# the ops token. Loading can evict other offices, so anonymous clients may not trigger it.
+@server.route("/catalogue/tenants/<tenant>/warm", methods=["POST"])
+def catalogue_warm_tenant(tenant):
+    if not ops_authorized():
+        return jsonify({"error": "this endpoint needs the ops token"}), 403
+    if tenant == DEFAULT_TENANT or tenant not in tenants:
+        return jsonify({"error": f"unknown tenant: {tenant}"}), 404
+    warm_tenant(tenant)
+    return jsonify(tenants.stats()["tenants"][tenant])
+
+
+# Link checker state and the flagged links, worst first: /catalogue/links?limit=100
+@server.route("/catalogue/links")
+def catalogue_links_report():
+    limit = min(max(request.args.get("limit", 100, type=int), 1), 10000)
+    return jsonify(dict(link_health.stats(), problems=link_health.problems()[:limit]))
+
+
+startup.mark("callbacks")
+
+
+def warm_up():
+    # Load the catalogue (lazy mode) and render what the first visitor needs: the page shell,
+    # Dash's first-request setup and the homepage, plus the CATALOGUE_WARM_TENANTS offices
+    if STARTUP_MODE == LAZY:
+        catalogue_store.reload(force=True)
+        startup.mark("catalogue")
+        warm_serializer()
+    client = server.test_client()
+    for path in ("/", "/_dash-layout", "/_dash-dependencies"):
+        client.get(path, environ_base=WARM_UP_ENVIRON)
+    warm_tenant(DEFAULT_TENANT)
+    for tenant in (tenants.names if WARM_TENANTS.strip() == "all" else WARM_TENANTS.split(",")):
+        if tenant.strip() in tenants.names:
+            warm_tenant(tenant.strip())
+    startup.mark("warm-up")
+
+
+def run_warm_up():
+    try:
+        warm_up()
+    except Exception as e:  # a failed warm-up must not keep the worker from serving
+        logger.exception("Warm-up failed: %s", e)
+    finally:
+        startup.done()
+        link_health.start()
+
+
+if STARTUP_MODE == LAZY:
+    threading.Thread(target=run_warm_up, name="catalogue-warm-up", daemon=True).start()
+else:
+    run_warm_up()
 
 
 # if __name__ == "__main__":
@@ -1,10 +1,38 @@
-document.addEventListener("DOMContentLoaded", function() {
-    const navLinks = document.querySelectorAll(".nav-link");
-    const currentPath = window.location.pathname;
+// Clientside callbacks (see app.clientside_callback in app.py)
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    catalogue: {
+        // Rotate the homepage carousel and alternate the fade class to re-trigger the animation
+        update_carousel: function(prevClicks, nextClicks, nIntervals, index, fadeTrigger, images) {
+            index = index || 0;
+            if (!images || !images.length) {
+                return window.dash_clientside.no_update;
+            }
 
-    navLinks.forEach(link => {
-        if (link.getAttribute("href") === currentPath) {
-            link.classList.add("active");
+            // Each image carries its own src/srcset for the fallback <img> and the AVIF/WebP <source>s
+            const slide = function(image, className) {
+                return [image.src, image.srcSet, image.avif, image.webp, className, index, !fadeTrigger];
+            };
+
+            const triggered = window.dash_clientside.callback_context.triggered;
+            if (!triggered || !triggered.length || !triggered[0].value) {
+                return slide(images[index % images.length], "carousel-image fade");  // Initial load
+            }
+
+            const buttonId = triggered[0].prop_id.split(".")[0];
+            if (buttonId === "next-btn" || buttonId === "carousel-timer") {
+                index = (index + 1) % images.length;
+            } else if (buttonId === "prev-btn") {
+                index = (index - 1 + images.length) % images.length;
+            }
+
+            return slide(images[index], fadeTrigger ? "carousel-image fade-alt" : "carousel-image fade");
+        },
+
+        // Mark the nav link for the current page as active
+        update_active_nav: function(pathname, hrefs) {
+            return (hrefs || []).map(function(href) {
+                return href === pathname ? "nav-link active" : "nav-link";
+            });
         }
-    });
+    }
 });
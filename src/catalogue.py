@@ -0,0 +1,351 @@
+import itertools
+from array import array
+from collections import Counter, namedtuple
+from functools import cached_property
+from urllib.parse import urlsplit
+
+from columnar import ProductTable, encode_columns, pack
+from search import SearchIndex, index_sections
+
+
+# Fully resolved dropdown state for one category page
+Selection = namedtuple("Selection", ["sectors", "sector", "years", "year", "titles", "title", "product"])
+
+# Dimensions of the facet cube, in key order
+FACETS = ("category", "sector", "year")
+
+
+class _Any:
+    def __repr__(self):
+        return "ANY"
+
+
+# An unfiltered facet in FacetCube keys (None is a possible sector or year value)
+ANY = _Any()
+
+
+def normalize_category(category):
+    # "Interactive Dashboards" -> "interactive-dashboards" (used for page links)
+    return str(category).lower().replace(" ", "-")
+
+
+def _match_option(options, value, fill_missing):
+    # Keep a valid value, map query-string values onto typed options ("2024" -> 2024),
+    # and fall back to the first option when the value no longer applies
+    if value is None or value == "":
+        return options[0] if fill_missing and options else None
+    if value in options:
+        return value
+    for option in options:
+        if str(option) == str(value):
+            return option
+    return options[0] if options else None
+
+
+def link_origin(url):
+    # "https://Drive.google.com/file/d/x" -> "https://drive.google.com"; None for non-http(s) links
+    try:
+        parts = urlsplit(str(url).strip())
+        host = parts.hostname
+        port = parts.port
+    except ValueError:
+        return None
+    if parts.scheme not in ("http", "https") or not host:
+        return None
+    if ":" in host:
+        host = f"[{host}]"
+    default = 443 if parts.scheme == "https" else 80
+    return f"{parts.scheme}://{host}" + (f":{port}" if port and port != default else "")
+
+
+def _sorted_keys(mapping):
+    # Keys can be a mix of types (e.g. Year read as int or str), so fall back to str ordering
+    try:
+        return sorted(mapping)
+    except TypeError:
+        return sorted(mapping, key=str)
+
+
+def table_columns(products):
+    # Column names in first-seen order across the rows
+    columns = {}
+    for product in products:
+        for column in product:
+            columns.setdefault(column, None)
+    return list(columns)
+
+
+def pack_catalogue(products, columns=None, meta=None, previous=None):
+    # Encode the rows, the Category -> Sector -> Year -> Title index and the search postings
+    # into one buffer (written as the snapshot file, or used in memory by build_table).
+    # `previous` is the ProductTable this one replaces; its postings are reused for unchanged rows.
+    columns = table_columns(products) if columns is None else list(columns)
+
+    # slug -> sector -> year -> title -> row; the first row wins when a title is listed twice
+    tree = {}
+    category_slugs = {}
+    categories = []
+    for row, product in enumerate(products):
+        category = product.get("Category")
+        slug = category_slugs.get(category)
+        if slug is None:
+            slug = category_slugs[category] = normalize_category(category)
+            if slug not in tree:
+                categories.append([slug, category, product.get("Image_URL", "")])
+        titles = (tree.setdefault(slug, {})
+                  .setdefault(product.get("Sector"), {})
+                  .setdefault(product.get("Year"), {}))
+        titles.setdefault(product.get("Title"), row)
+
+    # Rows sorted by category, sector, year and title; each (slug, sector, year) is a range of it
+    order = array("I")
+    groups = []
+    for slug, sectors in tree.items():
+        for sector in _sorted_keys(sectors):
+            for year in _sorted_keys(sectors[sector]):
+                titles = sectors[sector][year]
+                start = len(order)
+                order.extend(titles[title] for title in _sorted_keys(titles))
+                groups.append([slug, sector, year, start, len(order)])
+
+    if isinstance(products, ProductTable) and columns == products.columns:
+        # Already encoded (rows streamed in by the ingestion): reuse the column sections as they are
+        sections = products.column_sections()
+    else:
+        sections = encode_columns(products, columns)
+    sections["index:order"] = order
+    if not isinstance(products, ProductTable):
+        previous = None  # postings are only reused between encoded tables (snapshot rebuilds)
+    sections.update(index_sections(products, sorted(order), previous))
+    meta = dict(meta or {}, columns=columns, rows=len(products), documents=len(order), index={
+        "categories": categories,
+        "slugs": [[category, slug] for category, slug in category_slugs.items()],
+        "groups": groups,
+    })
+    return pack(sections, meta)
+
+
+def build_table(products, columns=None):
+    # In-memory ProductTable for rows that do not come from a snapshot file
+    return ProductTable(pack_catalogue(products, columns))
+
+
+class FacetCube:
+    """Product counts over Category x Sector x Year, with every roll-up precomputed.
+
+    Built from the index groups (one per category/sector/year cell), so it
+    never looks at a product. Counts for any combination of single-value
+    filters are one dict lookup, and a facet's counts one lookup per value of
+    that facet, however many products the catalogue has.
+    """
+
+    def __init__(self, cells):
+        # cells: (slug, sector, year, product count)
+        self.counts = {}
+        values = ({}, {}, {})
+        for slug, sector, year, count in cells:
+            cell = (slug, sector, year)
+            for dimension, value in enumerate(cell):
+                values[dimension].setdefault(value, None)
+            # The cell and its 7 roll-ups, where ANY replaces any subset of the dimensions
+            for mask in itertools.product((False, True), repeat=len(FACETS)):
+                key = tuple(ANY if rolled_up else value for rolled_up, value in zip(mask, cell))
+                self.counts[key] = self.counts.get(key, 0) + count
+        # Category slugs in index order; sectors and years sorted like the dropdowns
+        self.values = (
+            [value for value in values[0] if value is not None],
+            [value for value in _sorted_keys(values[1]) if value is not None],
+            [value for value in _sorted_keys(values[2]) if value is not None],
+        )
+
+    def count(self, category=ANY, sector=ANY, year=ANY):
+        try:
+            return self.counts.get((category, sector, year), 0)
+        except TypeError:  # unhashable value from the client
+            return 0
+
+    def facet(self, dimension, filters):
+        # [(value, count)] of one facet under the other filters; its own filter is ignored,
+        # so every facet lists the alternatives to the current choice
+        position = FACETS.index(dimension)
+        key = list(filters)
+        counts = []
+        for value in self.values[position]:
+            key[position] = value
+            counts.append((value, self.count(*key)))
+        return counts
+
+    def match(self, dimension, value):
+        # Facet value for a dropdown or query-string value ("2024" -> 2024); ANY if unset or unknown
+        if value is None or value == "":
+            return ANY
+        for option in self.values[FACETS.index(dimension)]:
+            if str(option) == str(value):
+                return option
+        return ANY
+
+
+class CatalogueIndex:
+    """Category -> Sector -> Year -> Title lookup over a ProductTable.
+
+    Sector and year option lists are precomputed; titles are ranges of a
+    sorted row array stored with the table, so the index holds nothing per
+    product and every dropdown callback resolves through dict lookups.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        index = products.meta.get("index", {})
+
+        # slug -> original category name, and original name -> slug
+        self.category_names = {}
+        self.category_slugs = {category: slug for category, slug in index.get("slugs", [])}
+        # slug -> first product image (for the homepage cards)
+        self.category_images = {}
+        for slug, category, image_url in index.get("categories", []):
+            self.category_names[slug] = category
+            self.category_images[slug] = image_url
+
+        # Precomputed, sorted option lists, and (slug, sector, year) -> (start, end) in `order`
+        self.order = products.section("index:order")
+        self.sectors = {}
+        self.years = {}
+        self.groups = {}
+        for slug, sector, year, start, end in index.get("groups", []):
+            sectors = self.sectors.setdefault(slug, [])
+            if not sectors or sectors[-1] != sector:
+                sectors.append(sector)
+            self.years.setdefault((slug, sector), []).append(year)
+            self.groups[(slug, sector, year)] = (start, end)
+
+        self.categories = list(self.sectors)
+        self.cube = FacetCube((slug, sector, year, end - start) for (slug, sector, year), (start, end)
+                              in self.groups.items())
+
+    def slug(self, category):
+        # Accepts either the raw category name (stored-section-head) or an existing slug
+        try:
+            if category in self.sectors:
+                return category
+            slug = self.category_slugs.get(category)
+        except TypeError:  # unhashable value from the client: no such category
+            return None
+        return slug if slug is not None else normalize_category(category)
+
+    def has_category(self, category):
+        return self.slug(category) in self.sectors
+
+    def category_name(self, category):
+        return self.category_names.get(self.slug(category))
+
+    def sectors_for(self, category):
+        return self.sectors.get(self.slug(category), [])
+
+    def years_for(self, category, sector):
+        try:
+            return self.years.get((self.slug(category), sector), [])
+        except TypeError:  # unhashable value from the client
+            return []
+
+    def _rows(self, category, sector, year):
+        try:
+            start, end = self.groups.get((self.slug(category), sector, year), (0, 0))
+        except TypeError:
+            return []
+        return self.order[start:end].tolist()
+
+    def titles_for(self, category, sector, year):
+        return [self.products.value(row, "Title") for row in self._rows(category, sector, year)]
+
+    def urls_for(self, category, sector, year):
+        # Product links, aligned with titles_for()
+        return [self.products.value(row, "URL") for row in self._rows(category, sector, year)]
+
+    def select_groups(self, categories=None, sectors=None, years=None):
+        # (slug, sector, year, start, end) for every group passing the filters, in index order.
+        # Filters are collections of query-string values (compared as strings); None means any.
+        slugs = None if categories is None else {self.slug(category) for category in categories}
+        sectors = None if sectors is None else {str(sector) for sector in sectors}
+        years = None if years is None else {str(year) for year in years}
+        return [
+            (slug, sector, year, start, end)
+            for (slug, sector, year), (start, end) in self.groups.items()
+            if (slugs is None or slug in slugs)
+            and (sectors is None or str(sector) in sectors)
+            and (years is None or str(year) in years)
+        ]
+
+    def group_rows(self, groups, offset=0, limit=None):
+        # Row ids in the given groups (from select_groups) from `offset` on, in index order
+        offset = max(offset, 0)
+        for _, _, _, start, end in groups:
+            if offset >= end - start:
+                offset -= end - start
+                continue
+            for row in self.order[start + offset:end].tolist():
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield row
+            offset = 0
+
+    def resolve(self, category, sector=None, year=None, title=None, fill_missing=True):
+        # Resolve sector -> year -> title in one pass. Missing values get the first option
+        # when fill_missing is set; a value cleared by the user otherwise stays cleared.
+        sectors = self.sectors_for(category)
+        sector = _match_option(sectors, sector, fill_missing)
+        years = self.years_for(category, sector) if sector is not None else []
+        year = _match_option(years, year, fill_missing)
+        rows = self._rows(category, sector, year) if year is not None else []
+        titles = [self.products.value(row, "Title") for row in rows]
+        title = _match_option(titles, title, fill_missing)
+        product = self.products[rows[titles.index(title)]] if title is not None else None
+        return Selection(sectors, sector, years, year, titles, title, product)
+
+
+class Catalogue:
+    """One consistent snapshot of the product data.
+
+    Snapshots are never modified after they are built; a reload builds a new
+    one and swaps the reference, so a callback that grabbed a snapshot keeps
+    seeing the same products, index and homepage cards until it returns.
+    `products` is a ProductTable (usually mapped from the snapshot file) or a
+    list of row dicts, which is packed into one. Page links start with
+    `base_path` (a tenant's "/nigeria", or "" for the default catalogue).
+    """
+
+    def __init__(self, products, version=None, base_path=""):
+        if not isinstance(products, ProductTable):
+            products = build_table(products)
+        self.products = products
+        self.version = version
+        self.base_path = base_path
+        self.index = CatalogueIndex(products)
+        self.categories = self.index.categories
+
+        # Full-text index over the postings stored with the table
+        self.search = SearchIndex(products)
+
+        # Homepage cards / nav entries, one per category
+        self.product_catalog = [
+            {
+                "title": cat.replace("-", " ").title(),
+                "image_url": self.index.category_images.get(cat, ""),
+                "link": f"{base_path}/{cat}"
+            }
+            for cat in self.categories
+        ]
+
+    @cached_property
+    def link_origins(self):
+        # Hosts of the product links (iframe sources) with their product counts, most used first;
+        # counted from the URL column's codes the first time a page shell asks for them
+        if "URL" not in self.products.columns:
+            return []
+        counts = Counter()
+        for url, rows in self.products.value_counts("URL"):
+            origin = link_origin(url)
+            if origin is not None:
+                counts[origin] += rows
+        return counts.most_common()
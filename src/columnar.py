@@ -0,0 +1,338 @@
+"""Compact column store for the product rows.
+
+Rows are kept column by column in one binary buffer. Every column is
+dictionary-encoded: each distinct value is stored once, and each row holds a
+small integer code for it, so repeated categories, sectors and years cost one or
+two bytes per row. The buffer is either built in memory or mapped read-only from
+a snapshot file. A mapped file lives in the OS page cache and is shared by every
+worker process, so workers do not each hold a copy of the rows.
+
+Rows are read through `Product`, a read-only mapping view (`product["Title"]`,
+`product.get(...)`, `dict(product)`) that decodes values on access.
+
+Layout: magic, header length, JSON header (metadata plus the offset, size and
+array type of every named section), then the 8-byte aligned sections.
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+
+MAGIC = b"CATCOLS1"
+_HEADER_LEN = struct.Struct("<I")
+ALIGNMENT = 8
+
+# Dictionaries up to this size are decoded once into a Python list (strings interned);
+# larger ones (titles, URLs, descriptions) stay in the buffer and are decoded per access
+MATERIALIZE_LIMIT = 4096
+
+# Per-value type tags of dictionary entries
+_NONE, _STR, _INT, _FLOAT, _BOOL = b"n", b"s", b"i", b"f", b"b"
+
+
+def code_typecode(count):
+    # Narrowest unsigned array type able to index `count` distinct values
+    if count <= 1 << 8:
+        return "B"
+    if count <= 1 << 16:
+        return "H"
+    return "I"
+
+
+def encode_strings(strings):
+    # -> (utf-8 blob, offsets) where string i is blob[offsets[i]:offsets[i + 1]]
+    offsets = array("I", [0])
+    chunks = []
+    size = 0
+    for value in strings:
+        data = value.encode("utf-8")
+        chunks.append(data)
+        size += len(data)
+        offsets.append(size)
+    return b"".join(chunks), offsets
+
+
+def _encode_value(value):
+    if value is None:
+        return _NONE, ""
+    if isinstance(value, bool):
+        return _BOOL, "1" if value else ""
+    if isinstance(value, int):
+        return _INT, str(value)
+    if isinstance(value, float):
+        return _FLOAT, repr(value)
+    return _STR, str(value)
+
+
+def _decode_value(tag, text):
+    if tag == 115:  # "s"
+        return text
+    if tag == 105:  # "i"
+        return int(text)
+    if tag == 102:  # "f"
+        return float(text)
+    if tag == 98:  # "b"
+        return text == "1"
+    return None
+
+
+class StringArray:
+    """Read-only sequence of strings stored as a utf-8 blob plus offsets."""
+
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class ValueArray:
+    """Dictionary of one column: the distinct values, decoded on access."""
+
+    __slots__ = ("strings", "tags", "values")
+
+    def __init__(self, strings, tags):
+        self.strings = strings
+        self.tags = tags
+        self.values = None
+        if len(strings) <= MATERIALIZE_LIMIT:
+            self.values = [self._decode(i) for i in range(len(strings))]
+
+    def _decode(self, i):
+        value = _decode_value(self.tags[i], self.strings[i])
+        return sys.intern(value) if isinstance(value, str) else value
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, i):
+        if self.values is not None:
+            return self.values[i]
+        return _decode_value(self.tags[i], self.strings[i])
+
+
+class ColumnEncoder:
+    """Dictionary-encodes rows one at a time.
+
+    Only the distinct values of each column and one code per row are kept, so a
+    caller streaming rows from a workbook never holds more than the row it is
+    adding. `table()` packs what was added into an in-memory ProductTable.
+    """
+
+    def __init__(self, columns=()):
+        self.columns = []
+        self.rows = 0
+        self._positions = {}
+        self._distinct = []  # per column: (type, value) -> code
+        self._codes = []  # per column: array("I") of codes, narrowed in sections()
+        for column in columns:
+            self.add_column(column)
+
+    def add_column(self, column):
+        # A column first seen after some rows were added is None in those rows
+        if column in self._positions:
+            return
+        self._positions[column] = len(self.columns)
+        self.columns.append(column)
+        self._distinct.append({(type(None), None): 0} if self.rows else {})
+        self._codes.append(array("I", bytes(4 * self.rows)))
+
+    def _code(self, position, value):
+        # 1 and 1.0 (or True) compare equal; keep them apart so values round-trip with their type
+        # (strings, most of the values, are their own key)
+        distinct = self._distinct[position]
+        key = value if type(value) is str else (type(value), value)
+        code = distinct.get(key)
+        if code is None:
+            code = distinct[key] = len(distinct)
+        return code
+
+    def append(self, row):
+        # Encodes the row's values of the known columns; returns its row id
+        for position, column in enumerate(self.columns):
+            self._codes[position].append(self._code(position, row.get(column)))
+        self.rows += 1
+        return self.rows - 1
+
+    def replace(self, row_id, row):
+        # Overwrites an added row (its old values stay in the dictionaries)
+        for position, column in enumerate(self.columns):
+            self._codes[position][row_id] = self._code(position, row.get(column))
+
+    def sections(self):
+        sections = {}
+        for position, distinct in enumerate(self._distinct):
+            tags = bytearray()
+            texts = []
+            for key in distinct:
+                value = key if type(key) is str else key[1]
+                tag, text = _encode_value(value)
+                tags += tag
+                texts.append(text)
+            blob, offsets = encode_strings(texts)
+            prefix = f"col{position}"
+            sections[f"{prefix}:codes"] = array(code_typecode(len(distinct)), self._codes[position])
+            sections[f"{prefix}:values"] = blob
+            sections[f"{prefix}:offsets"] = offsets
+            sections[f"{prefix}:tags"] = bytes(tags)
+        return sections
+
+    def table(self):
+        return ProductTable(pack(self.sections(), {"columns": self.columns, "rows": self.rows}))
+
+
+def encode_columns(rows, columns):
+    # Dictionary-encode every column -> sections for pack()
+    encoder = ColumnEncoder(columns)
+    for row in rows:
+        encoder.append(row)
+    return encoder.sections()
+
+
+def pack(sections, meta):
+    # sections: name -> bytes, array or (typed) memoryview; returns the whole buffer
+    index = {}
+    offset = 0
+    payloads = []
+    for name, data in sections.items():
+        if isinstance(data, array):
+            typecode = data.typecode
+        else:
+            typecode = data.format if isinstance(data, memoryview) else "B"
+        size = memoryview(data).nbytes
+        padding = -offset % ALIGNMENT
+        payloads.append(b"\0" * padding)
+        offset += padding
+        index[name] = [offset, size, typecode]
+        payloads.append(data)  # joined below without an intermediate copy
+        offset += size
+
+    # default=str matches how encode_columns stores values of other types
+    header = json.dumps({"meta": meta, "sections": index, "byteorder": sys.byteorder},
+                        separators=(",", ":"), default=str).encode("utf-8")
+    start = len(MAGIC) + _HEADER_LEN.size + len(header)
+    start += -start % ALIGNMENT
+    head = MAGIC + _HEADER_LEN.pack(len(header)) + header
+    return b"".join([head, b"\0" * (start - len(head))] + payloads)
+
+
+class Product(Mapping):
+    """Read-only view of one row; behaves like the row's dict."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, column):
+        return self._table.value(self._row, column)
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self):
+        return len(self._table.columns)
+
+    def __repr__(self):
+        return f"Product({dict(self)!r})"
+
+
+class ProductTable:
+    """Dictionary-encoded product rows over one buffer (bytes or a read-only mmap).
+
+    Indexing gives `Product` views; `section(name)` exposes the other arrays
+    stored alongside the columns (catalogue index, search postings).
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError("not a catalogue column file")
+        (header_len,) = _HEADER_LEN.unpack_from(view, len(MAGIC))
+        header_start = len(MAGIC) + _HEADER_LEN.size
+        header = json.loads(bytes(view[header_start:header_start + header_len]))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("catalogue column file was written on a machine with another byte order")
+        start = header_start + header_len
+        start += -start % ALIGNMENT
+
+        self.meta = header["meta"]
+        self._sections = {}
+        for name, (offset, size, typecode) in header["sections"].items():
+            section = view[start + offset:start + offset + size]
+            self._sections[name] = section if typecode == "B" else section.cast(typecode)
+
+        self.columns = list(self.meta.get("columns", []))
+        self._codes = {}
+        self._values = {}
+        for position, column in enumerate(self.columns):
+            prefix = f"col{position}"
+            self._codes[column] = self._sections[f"{prefix}:codes"]
+            self._values[column] = ValueArray(
+                StringArray(self._sections[f"{prefix}:values"], self._sections[f"{prefix}:offsets"]),
+                self._sections[f"{prefix}:tags"])
+        self._length = self.meta.get("rows", 0)
+
+    @classmethod
+    def open(cls, path):
+        # Read-only shared mapping; the file must be replaced (never rewritten) while mapped
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def nbytes(self):
+        # Size of the buffer (the mapped file for snapshots)
+        return len(self._buffer)
+
+    def __getitem__(self, row):
+        if not 0 <= row < self._length:
+            raise IndexError("product row out of range")
+        return Product(self, row)
+
+    def __iter__(self):
+        for row in range(self._length):
+            yield Product(self, row)
+
+    def value(self, row, column):
+        try:
+            codes = self._codes[column]
+        except (KeyError, TypeError):
+            raise KeyError(column) from None
+        return self._values[column][codes[row]]
+
+    def value_counts(self, column):
+        # (value, rows) for every value of the column that some row uses, from the codes alone
+        try:
+            codes = self._codes[column]
+        except (KeyError, TypeError):
+            raise KeyError(column) from None
+        values = self._values[column]
+        return [(values[code], count) for code, count in Counter(codes).items()]
+
+    def encoding(self, column):
+        # (code per row, distinct values) of a column as stored; KeyError for unknown columns
+        try:
+            return self._codes[column], self._values[column]
+        except TypeError:
+            raise KeyError(column) from None
+
+    def section(self, name):
+        return self._sections.get(name)
+
+    def column_sections(self):
+        # The encoded columns as stored, for packing them again with other sections
+        return {name: section for name, section in self._sections.items() if name.startswith("col")}
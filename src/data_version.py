@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from catalogue import Catalogue
+
+logger = logging.getLogger(__name__)
+
+
+def source_files(file_path):
+    # The workbook followed by its delta files ("products.delta-2025-06.xlsx"), in name order
+    directory, filename = os.path.split(file_path)
+    prefix = os.path.splitext(filename)[0] + ".delta"
+    try:
+        names = os.listdir(directory or ".")
+    except OSError:
+        names = []
+    deltas = sorted(name for name in names if name.startswith(prefix) and name.lower().endswith(".xlsx"))
+    return [file_path] + [os.path.join(directory, name) for name in deltas]
+
+
+def file_version(file_path):
+    # Content hash of the workbook and its delta files, so every worker agrees on the version
+    digest = hashlib.sha1()
+    for position, path in enumerate(source_files(file_path)):
+        if position:
+            digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _file_stat(file_path):
+    # Changes when the workbook or any delta file is modified, added or removed
+    stats = []
+    for path in source_files(file_path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            if path == file_path:
+                return None
+            continue
+        stats.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(stats)
+
+
+class CatalogueStore:
+    """Holds the current Catalogue snapshot and rebuilds it when the workbook changes.
+
+    `reader(file_path)` must return the product rows and raise on failure; a
+    failed reload keeps serving the previous snapshot. `base_path` is passed on
+    to every Catalogue (the tenant's URL prefix). With `load=False` the first
+    load is left to the caller (`reload(force=True)`, e.g. from a background
+    thread) and `current()` waits for it.
+    """
+
+    def __init__(self, file_path, reader, poll_interval=30, base_path="", load=True):
+        self.file_path = file_path
+        self.reader = reader
+        self.poll_interval = poll_interval
+        self.base_path = base_path
+
+        self.reload_count = 0
+        self.reload_errors = 0
+        self.loaded_at = None
+        self.last_error = None
+
+        self._stat = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._loaded = threading.Event()  # set once the first load was attempted
+        self._snapshot = Catalogue([], version=None, base_path=base_path)
+        if load:
+            self.reload(force=True)
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def current(self):
+        # Single reference read; callers should grab it once per request
+        if not self._loaded.is_set():
+            self._loaded.wait()
+        return self._snapshot
+
+    def reload(self, force=False):
+        # Only one rebuild at a time; concurrent callers just skip
+        if not self._lock.acquire(blocking=force):
+            return False
+        try:
+            stat = _file_stat(self.file_path)
+            if not force and stat == self._stat:
+                return False
+
+            if stat is None:
+                logger.error("File not found at %s", self.file_path)
+                self._stat = None
+                return False
+
+            version = file_version(self.file_path)
+            self._stat = stat
+            if version == self._snapshot.version:
+                return False  # touched but unchanged
+
+            try:
+                products = self.reader(self.file_path)
+            except Exception as e:
+                self.reload_errors += 1
+                self.last_error = str(e)
+                logger.error("Error loading Excel file: %s", e, extra={"file": self.file_path})
+                return False
+
+            # Build the whole snapshot first, then swap it in
+            self._snapshot = Catalogue(products, version=version, base_path=self.base_path)
+            self.reload_count += 1
+            self.loaded_at = time.time()
+            self.last_error = None
+            logger.info("Catalogue version %s loaded (%d products)", version, len(products),
+                        extra={"version": version, "products": len(products)})
+            return True
+        finally:
+            self._loaded.set()
+            self._lock.release()
+
+    def start(self):
+        # Background watcher; one per worker process
+        if self.poll_interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._watch, name="catalogue-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Ends the watcher (e.g. when a tenant is evicted); current() keeps working
+        self._stopped.set()
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:  # keep the watcher alive
+                self.reload_errors += 1
+                self.last_error = str(e)
+                logger.exception("Catalogue reload failed: %s", e)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "reload_count": self.reload_count,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+            "loaded_at": self.loaded_at,
+            "products": len(self._snapshot.products),
+            "bytes": self._snapshot.products.nbytes,
+            "file": self.file_path,
+            "pid": os.getpid(),
+        }
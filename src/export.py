@@ -0,0 +1,433 @@
+"""Static-site export: the whole catalogue as plain files for any static host or CDN.
+
+    python src/export.py [output_dir] [--full]      (default: build/site)
+
+The homepage, every category page and one page per product (the category page
+with that product selected) are prerendered from the app's own layouts, so the
+export looks like the app without any Python at request time:
+
+    index.html, <category>/index.html          homepage and category pages
+    <category>/<sector>/<year>/<title>.html     product pages
+    static/data/<category>/index.json          a category's sectors, years and the shard of each group
+    static/data/<category>/<hash>.json          one (sector, year) group: title, link, description, page
+    static/data/search.json                     titles for the search box (loaded on first use)
+    static/catalogue.<hash>.js                  dropdowns, search and carousel in the browser
+    assets/...                                  the app's assets, as /assets/ in the app
+
+Shards and the page script have content-hashed names, so a CDN can cache them
+forever. Country offices are exported under /<name>/ (and their data under
+static/data/<name>/), like in the app. Category pages keep working with the
+app's deep links (?sector=&year=&title=), which the page script resolves.
+
+The export is incremental: .export-manifest.json records a digest of each
+file's inputs (its product rows, the page shell and the code version). Files
+whose inputs did not change are neither rendered nor rewritten, and the files
+of removed products are deleted. --full rewrites everything.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from html import escape
+
+# The export renders pages once and exits: no reload watcher, link checks or thumbnail proxy
+for name, value in (("CATALOGUE_RELOAD_INTERVAL", "0"), ("LINK_CHECK_INTERVAL", "0"), ("IMAGE_PROXY", "0"),
+                    ("METRICS", "0"), ("LAYOUT_CACHE_SIZE", "0"), ("STARTUP_MODE", "eager")):
+    os.environ.setdefault(name, value)
+
+import app  # noqa: E402
+from http_cache import code_version  # noqa: E402
+from images import DEFAULT_MANIFEST  # noqa: E402
+from shared_files import write_atomic  # noqa: E402
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(script_dir, 'build', 'site')
+PAGE_SCRIPT = os.path.join(script_dir, 'static_site', 'catalogue.js')
+MANIFEST = ".export-manifest.json"
+
+# Assets the static pages do not use: workbooks, the Dash clientside callbacks and
+# precompressed variants (the CDN compresses)
+SKIPPED_ASSETS = ("tenants",)
+SKIPPED_ASSET_EXTENSIONS = (".xlsx", ".gz", ".br")
+SKIPPED_ASSET_FILES = ("script.js",)
+
+# Separates the sector and year of a group in the category index's shard keys
+GROUP_KEY_SEPARATOR = "\x1f"
+
+VOID_TAGS = {"area", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Component props that are Dash state rather than HTML attributes
+SKIPPED_PROPS = {"children", "style", "className", "n_clicks", "n_clicks_timestamp", "disable_n_clicks",
+                 "loading_state", "key", "setProps"}
+ATTRIBUTE_NAMES = {"className": "class", "htmlFor": "for", "srcSet": "srcset", "autoComplete": "autocomplete",
+                   "tabIndex": "tabindex", "contentEditable": "contenteditable"}
+# CSS properties whose numbers are unitless (the others get "px", as React does)
+UNITLESS_CSS = {"flexGrow", "flexShrink", "fontWeight", "lineHeight", "opacity", "order", "zIndex"}
+_CSS_NAME = re.compile(r"[A-Z]")
+
+
+def digest(*parts):
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def slugify(value):
+    # Path segment for a sector, year or title ("WASH / Health" -> "wash-health")
+    slug = re.sub(r"[^a-z0-9]+", "-", str(value).lower()).strip("-")
+    return slug or "unspecified"
+
+
+def unique_slugs(values):
+    # value -> slug, unique among `values`; colliding slugs get a short hash of the value
+    slugs = {}
+    taken = set()
+    for value in values:
+        slug = slugify(value)
+        if slug in taken:
+            slug = f"{slug}-{hashlib.sha1(str(value).encode('utf-8')).hexdigest()[:6]}"
+        taken.add(slug)
+        slugs[value] = slug
+    return slugs
+
+
+def group_key(sector, year):
+    # Key of a (sector, year) group in a category index; JSON keys are strings, None is ""
+    return f"{'' if sector is None else sector}{GROUP_KEY_SEPARATOR}{'' if year is None else year}"
+
+
+# --- Dash components -> HTML -------------------------------------------------------------------
+
+def _kebab(match):
+    return "-" + match.group(0)
+
+
+def _css(style):
+    declarations = []
+    for name, value in style.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and name not in UNITLESS_CSS:
+            value = f"{value}px"
+        declarations.append(f"{_CSS_NAME.sub(_kebab, name).lower()}: {value}")
+    return "; ".join(declarations)
+
+
+def _attributes(props, names=None):
+    attributes = []
+    if props.get("className"):
+        attributes.append(("class", props["className"]))
+    if props.get("style"):
+        attributes.append(("style", _css(props["style"])))
+    for name, value in props.items():
+        if name in SKIPPED_PROPS or (names is not None and name not in names):
+            continue
+        if name == "id" and not isinstance(value, str):  # pattern-matching ids only matter to Dash
+            continue
+        if value is None or value is False:
+            continue
+        attributes.append((ATTRIBUTE_NAMES.get(name, name.lower()), "" if value is True else value))
+    return "".join(f' {name}="{escape(str(value))}"' if value != "" else f" {name}" for name, value in attributes)
+
+
+def _json_script(element_id, data):
+    # JSON data island; "</" is escaped so a value cannot close the <script>
+    content = json.dumps(data, separators=(",", ":")).replace("</", "<\\/")
+    return f'<script type="application/json" id="{escape(element_id)}">{content}</script>'
+
+
+def _dropdown(props):
+    # A <select> with the placeholder and the selected option; the page script fills in the others
+    value = props.get("value")
+    options = [option if isinstance(option, dict) else {"label": option, "value": option}
+               for option in props.get("options") or []]
+    html_options = [f'<option value="">{escape(props.get("placeholder") or "")}</option>']
+    html_options += [f'<option value="{escape(str(option["value"]))}" selected>{escape(str(option["label"]))}</option>'
+                     for option in options if value is not None and option["value"] == value]
+    attributes = _attributes(dict(props, className="static-dropdown"), names={"id", "disabled"})
+    return f"<select{attributes}>{''.join(html_options)}</select>"
+
+
+def to_html(node):
+    # Dash html/dcc component tree -> markup. Stores become JSON data islands; Location and
+    # Interval only drive callbacks and are left out.
+    if node is None or isinstance(node, bool):
+        return ""
+    if isinstance(node, (list, tuple)):
+        return "".join(to_html(child) for child in node)
+    if isinstance(node, (str, int, float)):
+        return escape(str(node), quote=False)
+
+    component = node.to_plotly_json()
+    props, kind, namespace = component["props"], component["type"], component["namespace"]
+    if namespace == "dash_html_components":
+        tag = kind.lower()
+        if tag in VOID_TAGS:
+            return f"<{tag}{_attributes(props)}>"
+        return f"<{tag}{_attributes(props)}>{to_html(props.get('children'))}</{tag}>"
+    if kind == "Store":
+        return _json_script(props["id"], props.get("data"))
+    if kind == "Dropdown":
+        return _dropdown(props)
+    if kind == "Input":
+        return f"<input{_attributes(props, names={'id', 'type', 'placeholder', 'autoComplete', 'value'})}>"
+    if kind in ("Location", "Interval"):
+        return ""
+    return to_html(props.get("children"))
+
+
+def find(node, element_id):
+    # The component with `element_id` in a layout tree, or None
+    if isinstance(node, (list, tuple)):
+        for child in node:
+            found = find(child, element_id)
+            if found is not None:
+                return found
+        return None
+    if not hasattr(node, "to_plotly_json"):
+        return None
+    if getattr(node, "id", None) == element_id:
+        return node
+    return find(getattr(node, "children", None), element_id)
+
+
+class Shell:
+    """The app's page layout (top bar, nav, search, footer) around a page's content.
+
+    One shell per nav state: the nav marks the current category. `digest`
+    changes whenever the rendered shell does.
+    """
+
+    # Stands in for the page content while the shell is rendered
+    CONTENT = "\x00content\x00"
+
+    def __init__(self, catalogue, pathname, script):
+        layout = app.serve_layout()
+        find(layout, "nav-menu").children = app.nav_links(catalogue, pathname, browse=False)
+        find(layout, "page-content").children = self.CONTENT
+        self.before, self.after = to_html(layout).split(self.CONTENT)
+        self.script = script
+        self.digest = digest(self.before, self.after, script)
+
+    def page(self, content, title, data, hints=""):
+        # resource_hints() indents its tags for the Dash index template
+        hints = "".join(line.strip() + "\n" for line in hints.splitlines())
+        return (
+            "<!DOCTYPE html>\n"
+            '<html lang="en">\n<head>\n'
+            '<meta charset="utf-8">\n'
+            '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+            f"<title>{escape(title)}</title>\n"
+            f"{hints}"
+            '<link rel="stylesheet" href="/assets/style.css">\n'
+            "</head>\n<body>\n"
+            f"{self.before}{to_html(content)}{self.after}\n"
+            f"{_json_script('catalogue-page', data)}\n"
+            f'<script src="{self.script}" defer></script>\n'
+            "</body>\n</html>\n"
+        )
+
+
+# --- Output ------------------------------------------------------------------------------------
+
+class SiteWriter:
+    """Writes the files of one export, skipping those whose inputs did not change.
+
+    `put(path, key, render)` records the file under its input digest `key` and
+    only calls `render()` when the previous export had another one. `finish()`
+    deletes what the previous export wrote and this one did not, and saves the
+    manifest.
+    """
+
+    def __init__(self, output_dir, full=False):
+        self.output_dir = os.path.abspath(output_dir)
+        self.previous = {}
+        if not full:
+            try:
+                with open(os.path.join(output_dir, MANIFEST)) as f:
+                    self.previous = json.load(f)
+            except (OSError, ValueError):
+                pass
+        self.files = {}  # relative path -> input digest
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def _path(self, path):
+        return os.path.join(self.output_dir, *path.split("/"))
+
+    def put(self, path, key, render):
+        self.files[path] = key
+        if self.previous.get(path) == key and os.path.exists(self._path(path)):
+            self.unchanged += 1
+            return False
+        self.write(path, render())
+        self.written += 1
+        return True
+
+    def write(self, path, data):
+        write_atomic(self._path(path), data)
+
+    def finish(self):
+        for path in set(self.previous) - set(self.files):
+            try:
+                os.remove(self._path(path))
+                self.removed += 1
+            except OSError:
+                continue
+            # Drop directories left empty (a removed category or sector)
+            directory = os.path.dirname(self._path(path))
+            while directory != self.output_dir:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+        self.write(MANIFEST, json.dumps(self.files, sort_keys=True, indent=0))
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def export_assets(site, assets_dir):
+    # The app's /assets/ files, keyed on size and modification time
+    for root, dirs, files in os.walk(assets_dir):
+        dirs[:] = sorted(d for d in dirs if not (root == assets_dir and d in SKIPPED_ASSETS))
+        for name in sorted(files):
+            if name.endswith(SKIPPED_ASSET_EXTENSIONS) or name.startswith("~$") or (
+                    root == assets_dir and name in SKIPPED_ASSET_FILES):
+                continue
+            source = os.path.join(root, name)
+            stat = os.stat(source)
+            path = "assets/" + os.path.relpath(source, assets_dir).replace(os.sep, "/")
+            site.put(path, digest(stat.st_size, stat.st_mtime_ns), lambda: _read(source))
+
+
+def export_script(site):
+    # The page script under a content-hashed name -> its URL
+    script = _read(PAGE_SCRIPT)
+    path = f"static/catalogue.{hashlib.sha1(script).hexdigest()[:10]}.js"
+    site.put(path, digest(script.decode("utf-8")), lambda: script)
+    return f"/{path}"
+
+
+def _json_file(site, path, data):
+    content = json.dumps(data, separators=(",", ":"))
+    site.put(path, digest(content), lambda: content)
+
+
+def _shard(site, directory, products):
+    # Content-hashed group shard -> its URL
+    content = json.dumps(products, separators=(",", ":"))
+    path = f"{directory}/{hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]}.json"
+    site.put(path, digest(content), lambda: content)
+    return f"/{path}"
+
+
+def export_catalogue(site, catalogue, script, version):
+    # Pages and data of one catalogue (the default one or a country office's)
+    # Every page's resource hints name the catalogue's most used link hosts
+    version = digest(version, catalogue.link_origins[:app.PRECONNECT_ORIGINS + app.DNS_PREFETCH_ORIGINS])
+    base = catalogue.base_path
+    prefix = base.strip("/") + "/" if base else ""
+    data_dir = f"static/data{base}"
+    index = catalogue.index
+    page_data = {"search": f"/{data_dir}/search.json", "searchResults": app.SEARCH_RESULTS,
+                 "searchMinLength": app.MIN_PREFIX, "loading": app.LOADING_PAGE}
+    search = []
+
+    home_shell = Shell(catalogue, base or "/", script)
+    site.put(f"{prefix}index.html",
+             digest(version, home_shell.digest, catalogue.product_catalog),
+             lambda: home_shell.page(app.homepage(catalogue, cards=None), app.app.title, page_data,
+                                     app.resource_hints(catalogue)))
+
+    groups = {}
+    for (slug, sector, year), span in index.groups.items():
+        groups.setdefault(slug, []).append((sector, year, span))
+
+    for slug in index.categories:
+        name = index.category_name(slug)
+        pathname = f"{base}/{slug}"
+        shell = Shell(catalogue, pathname, script)
+        sector_slugs = unique_slugs(index.sectors_for(slug))
+        category = {"name": name, "sectors": index.sectors_for(slug), "years": {}, "shards": {}}
+
+        for sector, year, (start, end) in groups[slug]:
+            category["years"].setdefault("" if sector is None else str(sector), []).append(year)
+            # Titles that repeat within a group cannot be told apart in the dropdown; the app
+            # shows the first one, and so does the export
+            products = []
+            titles = set()
+            for row in index.order[start:end].tolist():
+                product = catalogue.products[row]
+                if product["Title"] not in titles:
+                    titles.add(product["Title"])
+                    products.append(product)
+            title_slugs = unique_slugs([product["Title"] for product in products])
+            year_slug = unique_slugs(index.years_for(slug, sector))[year]
+            shard = []
+            for product in products:
+                path = f"{pathname}/{sector_slugs[sector]}/{year_slug}/{title_slugs[product['Title']]}.html"
+                shard.append([product["Title"], product.get("URL"), product.get("Description"), path])
+                search.append([product["Title"], f'{product["Category"]} · {product["Sector"]} · {product["Year"]}',
+                               path])
+                site.put(path.lstrip("/"), digest(version, shell.digest, dict(product)),
+                         lambda: render_product(shell, catalogue, slug, product, page_data))
+            category["shards"][group_key(sector, year)] = _shard(site, f"{data_dir}/{slug}", shard)
+
+        index_url = f"/{data_dir}/{slug}/index.json"
+        _json_file(site, index_url.lstrip("/"), category)
+
+        # The category page shows the first product, like the app without a query string
+        first = index.resolve(slug).product
+        site.put(f"{prefix}{slug}/index.html", digest(version, shell.digest, index_url, dict(first or {})),
+                 lambda: shell.page(app.product_page(slug, catalogue), f"{name} · {app.app.title}",
+                                    dict(page_data, category=category_data(index_url, pathname, None)),
+                                    app.resource_hints(catalogue, first)))
+
+    _json_file(site, f"{data_dir}/search.json", search)
+    return len(search)
+
+
+def category_data(index_url, pathname, product):
+    # What the page script needs to take over a category or product page
+    return {"index": index_url, "path": pathname,
+            "sector": product["Sector"] if product else None,
+            "year": product["Year"] if product else None,
+            "title": product["Title"] if product else None}
+
+
+def render_product(shell, catalogue, slug, product, page_data):
+    content = app.product_page(slug, catalogue, app.page_query(product["Sector"], product["Year"], product["Title"]))
+    pathname = f"{catalogue.base_path}/{slug}"
+    index_url = f"/static/data{catalogue.base_path}/{slug}/index.json"
+    return shell.page(content, f"{product['Title']} · {app.app.title}",
+                      dict(page_data, category=category_data(index_url, pathname, product)),
+                      app.resource_hints(catalogue, product))
+
+
+def export_site(output_dir=DEFAULT_OUTPUT, full=False):
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    site = SiteWriter(output_dir, full=full)
+    # Rendering code and build outputs the pages depend on (e.g. the image derivatives)
+    version = code_version(extra_files=[DEFAULT_MANIFEST])
+
+    export_assets(site, os.path.join(script_dir, 'assets'))
+    script = export_script(site)
+    products = 0
+    for tenant in [app.DEFAULT_TENANT] + app.tenants.names:
+        products += export_catalogue(site, app.tenants.current(tenant), script, version)
+        if tenant != app.DEFAULT_TENANT:
+            app.tenants.evict(tenant)  # one country office in memory at a time
+    site.finish()
+    return {"products": products, "written": site.written, "unchanged": site.unchanged, "removed": site.removed,
+            "seconds": round(time.perf_counter() - start, 1)}
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--full"]
+    output = args[0] if args else DEFAULT_OUTPUT
+    stats = export_site(output, full="--full" in sys.argv[1:])
+    print(f"Exported {stats['products']} products to {output} in {stats['seconds']}s: "
+          f"{stats['written']} files written, {stats['unchanged']} unchanged, {stats['removed']} removed")
@@ -0,0 +1,295 @@
+"""Response compression and HTTP cache validation for the Flask server.
+
+- Text responses (layout/callback JSON, Dash bundles, CSS/JS/HTML) are
+  compressed with brotli when the client accepts it and the `brotli` package is
+  installed, otherwise gzip. Static files under assets/ are served from
+  precompressed .br/.gz siblings when the build step has produced them.
+- Data-derived GET endpoints (the Dash layout, search results...) carry a
+  strong ETag built from the catalogue data version and the code version, and
+  a matching If-None-Match is answered with 304 before anything is rendered.
+- Compressed variants get their own ETag ("<etag>-br" / "<etag>-gzip"); the
+  suffix is stripped again from incoming If-None-Match headers so Flask's own
+  static-file validation keeps working.
+
+Precompress the static assets as part of the deploy:
+
+    python src/http_cache.py
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request, send_file
+from werkzeug.http import parse_etags, quote_etag
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(script_dir, 'assets')
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.html', '.json', '.svg', '.txt')
+# Not worth the CPU (or the extra bytes of framing) below this size
+MIN_COMPRESS_SIZE = 512
+# Budget for compressed copies of static responses (Dash bundles, assets) kept in memory
+COMPRESSED_CACHE_BYTES = 32 * 1024 * 1024
+
+ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+
+def code_version(directory=script_dir, extra_files=()):
+    # Hash of the app's own source (plus build outputs the pages depend on),
+    # identical across workers of the same deploy
+    digest = hashlib.sha1()
+    paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.py')]
+    for path in paths + list(extra_files):
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"missing")
+    return digest.hexdigest()[:8]
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def precompress_assets(assets_dir=ASSETS_DIR):
+    # Write .gz (and .br with brotli installed) next to each text asset; highest ratio, done once at build
+    written = 0
+    for root, _, files in os.walk(assets_dir):
+        for name in files:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = [(".gz", gzip.compress(data, compresslevel=9))]
+            if brotli is not None:
+                variants.append((".br", brotli.compress(data, quality=11)))
+            for ext, compressed in variants:
+                if len(compressed) < len(data):
+                    with open(path + ext, 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+    return written
+
+
+class ResponseLayer:
+    """Compression, ETags and Cache-Control for every response of a Flask app.
+
+    `version_func()` returns the current catalogue data version; responses of
+    `versioned_paths` are tagged with it.
+    """
+
+    def __init__(self, version_func, versioned_paths=(), assets_url="/assets/", assets_dir=ASSETS_DIR,
+                 immutable_prefixes=(), build_files=()):
+        self.version_func = version_func
+        self.versioned_paths = set(versioned_paths)
+        self.assets_url = assets_url
+        self.assets_dir = assets_dir
+        self.immutable_prefixes = tuple(immutable_prefixes)
+        self.code_version = code_version(extra_files=build_files)
+
+        self.not_modified = 0
+        self.compressed = 0
+        self.precompressed = 0
+
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, server):
+        server.before_request(self._before_request)
+        server.after_request(self._after_request)
+
+    def etag(self):
+        return f"{self.version_func()}-{self.code_version}"
+
+    def is_not_modified(self, etag):
+        return parse_etags(request.headers.get("If-None-Match")).contains(etag)
+
+    def _accepted_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    def _before_request(self):
+        if request.method not in ("GET", "HEAD"):
+            return None
+
+        # Compressed variants carry suffixed ETags; compare on the underlying resource, but only
+        # for codings this request still accepts (otherwise the client gets a full response)
+        header = request.environ.get("HTTP_IF_NONE_MATCH")
+        if header:
+            request.environ["catalogue.if_none_match"] = header
+            etags = parse_etags(header)
+            stripped = []
+            for tag in etags.as_set(include_weak=True):
+                for encoding, suffix in ENCODING_SUFFIXES.items():
+                    if tag.endswith(suffix):
+                        tag = tag[:-len(suffix)] if request.accept_encodings[encoding] else None
+                        break
+                if tag is not None:
+                    stripped.append(quote_etag(tag))
+            if stripped or etags.star_tag:
+                request.environ["HTTP_IF_NONE_MATCH"] = ", ".join(stripped) or header
+            else:
+                del request.environ["HTTP_IF_NONE_MATCH"]
+
+        if request.path in self.versioned_paths:
+            etag = self.etag()
+            if self.is_not_modified(etag):
+                # Skip rendering entirely; nothing changed since the client's copy
+                self.not_modified += 1
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "no-cache"
+                return response
+            return None
+
+        if request.path.startswith(self.assets_url):
+            return self._serve_precompressed(request.path[len(self.assets_url):])
+        return None
+
+    def _serve_precompressed(self, relative_path):
+        encoding = self._accepted_encoding()
+        if encoding is None:
+            return None
+        path = os.path.normpath(os.path.join(self.assets_dir, relative_path))
+        if not path.startswith(self.assets_dir + os.sep):
+            return None
+        compressed_path = path + (".br" if encoding == "br" else ".gz")
+        try:
+            if os.path.getmtime(compressed_path) < os.path.getmtime(path):
+                return None  # stale; fall back to the original
+        except OSError:
+            return None
+
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        response = send_file(compressed_path, mimetype=mimetype, conditional=True, etag=True)
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Cache-Control"] = self._cache_control(request.path)
+        response.vary.add("Accept-Encoding")
+        self.precompressed += 1
+        return response
+
+    def _cache_control(self, path):
+        if path.startswith(self.immutable_prefixes):
+            return "public, max-age=31536000, immutable"
+        return "no-cache"  # always revalidate; answered with 304 while unchanged
+
+    def _after_request(self, response):
+        if request.method in ("GET", "HEAD") and response.status_code == 200:
+            if request.path in self.versioned_paths:
+                response.set_etag(self.etag())
+                response.headers["Cache-Control"] = "no-cache"
+            elif request.path.startswith(self.immutable_prefixes):
+                response.headers["Cache-Control"] = self._cache_control(request.path)
+
+        if response.status_code == 304:
+            return self._echo_etag(response)
+        return self._compress(response)
+
+    def _echo_etag(self, response):
+        # A 304 repeats the ETag the client holds, which may be a compressed variant's
+        etag, weak = response.get_etag()
+        original = request.environ.get("catalogue.if_none_match")
+        if etag and original:
+            held = parse_etags(original)
+            for suffix in ENCODING_SUFFIXES.values():
+                if held.contains_weak(etag + suffix):
+                    response.set_etag(etag + suffix, weak=weak)
+                    break
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def _compress(self, response):
+        # GET pages/assets and POST callback responses; HEAD has no body to compress
+        if (response.status_code != 200 or request.method not in ("GET", "POST")
+                or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        if response.is_streamed and not response.direct_passthrough:
+            return response  # generators (e.g. NDJSON exports) stay streamed
+        encoding = self._accepted_encoding()
+        response.vary.add("Accept-Encoding")
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        # ETag-stable or long-lived fingerprinted GET responses (files, Dash bundles, versioned
+        # endpoints) keep their compressed copies
+        cacheable = request.method == "GET" and (etag or response.cache_control.max_age)
+        cache_key = (request.full_path, etag, encoding) if cacheable else None
+        body = self._cached(cache_key)
+        if body is None:
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < MIN_COMPRESS_SIZE:
+                return response
+            body = compress(data, encoding)
+            self._store(cache_key, body)
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            response.set_etag(etag + ENCODING_SUFFIXES[encoding], weak=weak)
+        self.compressed += 1
+        return response
+
+    def _cached(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _store(self, key, body):
+        if key is None or len(body) > COMPRESSED_CACHE_BYTES // 4:
+            return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = body
+            self._cache_bytes += len(body)
+            while self._cache_bytes > COMPRESSED_CACHE_BYTES:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def stats(self):
+        return {
+            "not_modified": self.not_modified,
+            "compressed": self.compressed,
+            "precompressed": self.precompressed,
+            "compressed_cache_bytes": self._cache_bytes,
+            "brotli": brotli is not None,
+        }
+
+
+if __name__ == "__main__":
+    count = precompress_assets(*sys.argv[1:2])
+    print(f"Wrote {count} precompressed asset variants")
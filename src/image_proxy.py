@@ -0,0 +1,300 @@
+"""Caching proxy for the remote card thumbnails (the workbook's Image_URL).
+
+Card images usually point at full-size pictures on third-party hosts. The
+proxy fetches each one once, shrinks it to card size and keeps the result in
+an on-disk cache shared by the workers, so visitors get a small image with
+long-lived cache headers:
+
+    GET /images/proxy?src=<Image_URL>&w=240[&tenant=nigeria]
+
+- Only URLs the catalogue actually uses are fetched (`allowed(src)`), so the
+  route cannot be used as an open proxy.
+- Concurrent misses for the same image wait for a single fetch: in a worker
+  through a shared future, across workers through a lock file.
+- The cache is bounded in bytes; the least recently served files go first.
+  Entries older than CACHE_TTL are fetched again, and served stale if the
+  host is down.
+- A failed fetch redirects to the original URL (and is not retried for
+  FAILURE_TTL seconds), so the card still shows its image.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from urllib.parse import urlencode, urlsplit
+
+from flask import abort, redirect, request, send_file
+
+from images import FORMATS, MIME_TYPES
+from shared_files import file_lock, write_atomic
+
+logger = logging.getLogger(__name__)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(script_dir, 'build', 'image-cache')
+
+# Card image widths (1x and 2x of the 240px `sizes` of the cards); the height follows the aspect
+# ratio, capped at MAX_ASPECT times the width
+WIDTHS = (240, 480)
+MAX_ASPECT = 1.5
+
+# Cached files are fetched again after a week; browsers keep them for a day
+CACHE_TTL = 7 * 24 * 3600
+BROWSER_MAX_AGE = 24 * 3600
+# A host that failed is not retried (its URL is redirected to) for this long
+FAILURE_TTL = 300
+
+FETCH_TIMEOUT = 10
+# Larger sources are refused rather than downloaded and decoded
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+USER_AGENT = "iMMAP-Catalogue-ImageProxy/1.0"
+
+
+class FetchError(Exception):
+    pass
+
+
+def fetch(src, timeout=FETCH_TIMEOUT, max_bytes=MAX_SOURCE_BYTES):
+    req = urllib.request.Request(src, headers={"User-Agent": USER_AGENT, "Accept": "image/*"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            data = response.read(max_bytes + 1)
+    except (OSError, ValueError) as e:  # URLError, HTTPError and timeouts are OSErrors
+        raise FetchError(str(e)) from None
+    if len(data) > max_bytes:
+        raise FetchError(f"larger than {max_bytes} bytes")
+    return data
+
+
+def thumbnail(data, width, fmt):
+    # Source bytes -> card-sized image encoded as `fmt` (JPEG sources are decoded at reduced size)
+    from PIL import Image, ImageOps
+
+    box = (width, round(width * MAX_ASPECT))
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Rotated upright before sizing, so the box applies to the displayed orientation; the
+            # JPEG draft keeps both sides at least the box height, whichever way the image turns
+            image.draft(image.mode, (box[1], box[1]))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(box, Image.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise FetchError(f"not a usable image: {e}") from None
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if fmt == "jpeg" and has_alpha:
+        # Cards are white; flatten transparent images onto that
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", image.size, "white")
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **FORMATS[fmt])
+    return buffer.getvalue()
+
+
+class ImageProxy:
+    """Registers the thumbnail route on a Flask app.
+
+    `allowed(src)` tells whether the current request may proxy `src` (it may
+    raise, e.g. the API's 404 for an unknown tenant). Files live under
+    `cache_dir`, which holds at most `max_bytes` of images.
+    """
+
+    def __init__(self, allowed, cache_dir=DEFAULT_CACHE_DIR, max_bytes=256 * 1024 * 1024,
+                 path="/images/proxy", fetch=fetch):
+        self.allowed = allowed
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.path = path
+        self.fetch = fetch
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.evictions = 0
+
+        self._flights = {}  # cache key -> Future of the fetch in progress
+        self._failures = {}  # cache key -> time until which the source is not retried
+        self._cache_bytes = None  # scanned on first use
+        self._lock = threading.Lock()
+
+    def init_app(self, server):
+        server.add_url_rule(self.path, "image_proxy", self.serve)
+
+    def url(self, src, width=WIDTHS[0], tenant=None):
+        # Proxy path for a remote http(s) image; anything else (e.g. /assets/...) is returned as is
+        if not is_remote(src):
+            return src
+        params = {"src": src, "w": width}
+        if tenant:
+            params["tenant"] = tenant
+        return f"{self.path}?{urlencode(params)}"
+
+    def srcset(self, src, tenant=None):
+        return ", ".join(f"{self.url(src, width, tenant)} {width}w" for width in WIDTHS)
+
+    def serve(self):
+        src = request.args.get("src", "")
+        width = request.args.get("w", WIDTHS[0], type=int)
+        if width not in WIDTHS or not is_remote(src) or not self.allowed(src):
+            abort(404)
+
+        fmt = self._format()
+        key = hashlib.sha256(f"{src}\n{width}\n{fmt}".encode("utf-8")).hexdigest()
+        path = os.path.join(self.cache_dir, key[:2], f"{key}.{'jpg' if fmt == 'jpeg' else fmt}")
+
+        if self._is_fresh(path):
+            self.hits += 1
+        else:
+            try:
+                self._fill(key, path, src, width, fmt)
+            except FetchError as e:
+                if not os.path.exists(path):
+                    return redirect(src)
+                logger.warning("Serving a stale thumbnail of %s: %s", src, e)
+
+        _touch(path)
+        try:
+            response = send_file(path, mimetype=MIME_TYPES.get(fmt, f"image/{fmt}"), conditional=True, etag=True,
+                                 max_age=BROWSER_MAX_AGE)  # public, max-age
+        except FileNotFoundError:  # just evicted by another worker
+            return redirect(src)
+        response.vary.add("Accept")
+        return response
+
+    def _format(self):
+        from PIL import features
+
+        if request.accept_mimetypes["image/webp"] and features.check("webp"):
+            return "webp"
+        return "jpeg"
+
+    def _is_fresh(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) < CACHE_TTL
+        except OSError:
+            return False
+
+    def _fill(self, key, path, src, width, fmt):
+        # Fetch and store the thumbnail once, however many requests are waiting for it
+        with self._lock:
+            if self._failures.get(key, 0) > time.time():
+                raise FetchError("failed recently")
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+        if not leader:
+            self.coalesced += 1
+            try:
+                return flight.result(timeout=FETCH_TIMEOUT * 3)
+            except FutureTimeout:
+                raise FetchError("timed out waiting for another request's fetch") from None
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # One lock file per cache subdirectory (at most 256, never cleaned up); without fcntl
+            # (Windows), misses are only deduplicated within a worker
+            with file_lock(os.path.join(os.path.dirname(path), ".lock")):
+                # Another worker may have stored it while this one waited for the lock
+                if not self._is_fresh(path):
+                    start = time.perf_counter()
+                    data = thumbnail(self.fetch(src), width, fmt)
+                    self._write(path, data)
+                    self.misses += 1
+                    logger.info("Cached thumbnail of %s (%d bytes, %.3fs)", src, len(data),
+                                time.perf_counter() - start)
+                else:
+                    self.hits += 1
+            flight.set_result(None)
+        except FetchError as e:
+            self.errors += 1
+            with self._lock:
+                self._failures[key] = time.time() + FAILURE_TTL
+            logger.warning("Thumbnail of %s failed: %s", src, e)
+            flight.set_exception(e)
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def _write(self, path, data):
+        write_atomic(path, data)
+        with self._lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._cache_bytes += len(data)
+            over = self._cache_bytes > self.max_bytes
+        if over:
+            self.evict(keep=path)
+
+    def _entries(self):
+        # (last served, size, path) of every cached file
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith((".lock", ".tmp")):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # evicted by another worker meanwhile
+                entries.append((stat.st_atime, stat.st_size, path))
+        return entries
+
+    def evict(self, keep=None):
+        # Least recently served first, down to 90% of the budget, sparing `keep` (about to be
+        # served). The directory is rescanned, which also picks up what the other workers added.
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        with self._lock:
+            self._cache_bytes = total
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "cache_bytes": self._cache_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def is_remote(src):
+    return isinstance(src, str) and urlsplit(src).scheme in ("http", "https")
+
+
+def _touch(path):
+    # The access time marks the last use for eviction (set explicitly: noatime mounts never update it);
+    # the modification time stays the fetch time, for CACHE_TTL
+    try:
+        os.utime(path, (time.time(), os.path.getmtime(path)))
+    except OSError:
+        pass
@@ -0,0 +1,165 @@
+"""Responsive image derivatives.
+
+The build step resizes every raster image in assets/ into AVIF/WebP/JPEG (PNG
+for images with transparency) at several widths, under content-hashed names in
+assets/img/, and records them in a manifest. Hashed files never change, so they
+are served with year-long immutable cache headers; the app uses the manifest to
+emit <picture>/srcset markup and falls back to the original file without it.
+
+Build it as part of the deploy (needs Pillow):
+
+    python src/images.py
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+
+from dash import html
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(script_dir, 'assets')
+OUTPUT_DIR = os.path.join(ASSETS_DIR, 'img')
+DEFAULT_MANIFEST = os.path.join(script_dir, 'build', 'images.json')
+
+# URL prefix of the derivatives, which get the immutable cache headers
+IMAGE_URL_PREFIX = "/assets/img/"
+
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+WIDTHS = (480, 960, 1440)
+
+# Pillow save options per output format
+FORMATS = {
+    "avif": {"quality": 55},
+    "webp": {"quality": 80, "method": 6},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+def _derivative_widths(width):
+    # Never upscale; the original width is always the largest variant
+    return [w for w in WIDTHS if w < width] + [width]
+
+
+def _encode(image, fmt):
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **FORMATS[fmt])
+    return buffer.getvalue()
+
+
+def build_images(assets_dir=ASSETS_DIR, output_dir=OUTPUT_DIR, manifest_path=DEFAULT_MANIFEST):
+    from PIL import Image, features
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {}
+    written = set()
+
+    for name in sorted(os.listdir(assets_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in SOURCE_EXTENSIONS:
+            continue
+
+        with Image.open(os.path.join(assets_dir, name)) as source:
+            source.load()
+            has_alpha = source.mode in ("RGBA", "LA") or (source.mode == "P" and "transparency" in source.info)
+            source = source.convert("RGBA" if has_alpha else "RGB")
+
+        formats = [fmt for fmt in ("avif", "webp") if features.check(fmt)]
+        fallback_format = "png" if has_alpha else "jpeg"
+        width, height = source.size
+
+        entry = {"width": width, "height": height, "fallback": None, "sources": {}}
+        for fmt in formats + [fallback_format]:
+            variants = []
+            for target in _derivative_widths(width):
+                image = source if target == width else source.resize(
+                    (target, max(1, round(height * target / width))), Image.LANCZOS)
+                data = _encode(image, fmt)
+                digest = hashlib.sha1(data).hexdigest()[:10]
+                filename = f"{stem}-{target}.{digest}.{'jpg' if fmt == 'jpeg' else fmt}"
+                path = os.path.join(output_dir, filename)
+                if not os.path.exists(path):
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                written.add(filename)
+                variants.append([IMAGE_URL_PREFIX + filename, target])
+            entry["sources"][fmt] = variants
+
+        # Mid-size fallback for browsers without srcset support
+        fallback = entry["sources"][fallback_format]
+        entry["fallback"] = fallback[min(1, len(fallback) - 1)][0]
+        manifest[f"/assets/{name}"] = entry
+
+    # Drop derivatives from previous builds
+    for filename in os.listdir(output_dir):
+        if filename not in written:
+            os.remove(os.path.join(output_dir, filename))
+
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def load_manifest(manifest_path=DEFAULT_MANIFEST):
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _props(**props):
+    # Leave unset props out of the component instead of sending nulls
+    return {key: value for key, value in props.items() if value is not None}
+
+
+def _srcset(variants):
+    return ", ".join(f"{url} {width}w" for url, width in variants)
+
+
+class ResponsiveImages:
+    """Looks up derivatives for an original /assets/... path and builds the markup."""
+
+    def __init__(self, manifest=None):
+        self.manifest = load_manifest() if manifest is None else manifest
+
+    def sources(self, src):
+        # Plain dict (also used as clientside carousel data); srcSet values are "" without derivatives
+        entry = self.manifest.get(src)
+        if not entry:
+            return {"src": src, "srcSet": "", "avif": "", "webp": ""}
+        fallback_format = "png" if "png" in entry["sources"] else "jpeg"
+        return {
+            "src": entry["fallback"],
+            "srcSet": _srcset(entry["sources"][fallback_format]),
+            "avif": _srcset(entry["sources"].get("avif", [])),
+            "webp": _srcset(entry["sources"].get("webp", [])),
+            "width": entry["width"],
+            "height": entry["height"],
+        }
+
+    def picture(self, src, sizes, className=None, id=None, source_ids=None, alt=None):
+        # <picture> with AVIF/WebP sources and a srcset fallback <img>; plain <img> without derivatives
+        sources = self.sources(src)
+        if not sources["srcSet"] and not source_ids:
+            return html.Img(src=src, **_props(id=id, className=className, alt=alt))
+
+        children = []
+        for fmt in ("avif", "webp"):
+            source_props = _props(id=source_ids[fmt] if source_ids else None)
+            children.append(html.Source(type=MIME_TYPES[fmt], srcSet=sources[fmt], sizes=sizes, **source_props))
+        children.append(html.Img(src=sources["src"], srcSet=sources["srcSet"], sizes=sizes,
+                                 **_props(id=id, className=className, alt=alt,
+                                          width=sources.get("width"), height=sources.get("height"))))
+        return html.Picture(children, className="responsive-picture")
+
+
+if __name__ == "__main__":
+    output = build_images(*sys.argv[1:3])
+    print(f"Wrote derivatives for {len(output)} images to {OUTPUT_DIR}")
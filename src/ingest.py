@@ -0,0 +1,173 @@
+"""Streaming ingestion of the product workbooks.
+
+Rows are read one at a time (openpyxl read-only mode) from every sheet of the
+workbook, then from its delta files (`products.delta-*.xlsx`, applied in name
+order). Each row is normalized, checked and dictionary-encoded straight into a
+ColumnEncoder, so no sheet, DataFrame or list of row dicts is ever held: what
+stays in memory is one code per row and column plus the distinct values.
+
+- Text is trimmed (key columns also collapse inner whitespace), empty cells
+  become None, whole-number floats become ints (2024.0 -> 2024) and a missing
+  Category becomes "Unknown".
+- Rows are identified by (Category, Sector, Year, Title), compared case- and
+  whitespace-insensitively. Within the workbook the first row wins; a delta
+  row replaces the row it matches, or is added when it matches none.
+- A sheet without the required columns is skipped, and so are rows without a
+  Title or URL.
+
+Every skipped row or sheet is written to the rejects report (CSV) with its
+file, sheet, row number and reason.
+"""
+import csv
+import hashlib
+import logging
+import os
+
+from columnar import ColumnEncoder
+from data_version import source_files
+from shared_files import AtomicFile
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ("Category", "Sector", "Year", "Title")
+# A sheet missing any of these is skipped
+REQUIRED_COLUMNS = ("URL", "Image_URL", "Description")
+# A row missing a value in any of these is rejected
+REQUIRED_VALUES = ("Title", "URL")
+
+SHEET_COLUMNS = tuple(dict.fromkeys(REQUIRED_COLUMNS + REQUIRED_VALUES))
+
+REJECT_FIELDS = ["file", "sheet", "row", "reason"] + list(KEY_COLUMNS)
+
+
+class IngestError(Exception):
+    pass
+
+
+def normalize_value(value, collapse=False):
+    if isinstance(value, str):
+        value = " ".join(value.split()) if collapse else value.strip()
+        return value or None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def row_key(row):
+    # Dedup identity: 2024 and "2024", or "Flood  map" and "flood map", are the same product.
+    # Kept as a 16-byte digest, so the table of seen keys stays small for large workbooks.
+    text = "\x1f".join(" ".join(str(row.get(column) or "").split()).casefold() for column in KEY_COLUMNS)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def iter_sheets(file_path):
+    # -> (sheet name, header, rows) per sheet; rows yields (row number, values) for non-blank rows
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = enumerate(sheet.iter_rows(values_only=True), start=1)
+            header = None
+            for number, values in rows:
+                if any(value is not None for value in values):
+                    header = [str(value).strip() if value is not None else None for value in values]
+                    break
+            if header is None:
+                continue  # empty sheet
+            yield sheet.title, header, ((number, values) for number, values in rows
+                                        if any(value is not None for value in values))
+    finally:
+        workbook.close()
+
+
+class RejectsReport:
+    """CSV of skipped rows, written as they are found (None: only counted)."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._writer = None
+        if path:
+            self._file = AtomicFile(path, "w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._file.file, REJECT_FIELDS)
+            self._writer.writeheader()
+
+    def add(self, file_path, sheet, row, reason, values=None):
+        self.count += 1
+        if self._writer is not None:
+            entry = {"file": os.path.basename(file_path), "sheet": sheet, "row": row, "reason": reason}
+            entry.update({column: (values or {}).get(column) for column in KEY_COLUMNS})
+            self._writer.writerow(entry)
+
+    def close(self, keep=True):
+        if self._file is None:
+            return
+        if keep:
+            self._file.commit()
+        else:
+            self._file.discard()
+        self._file = None
+
+
+def ingest(file_path, rejects_path=None):
+    """Read the workbook and its delta files into an in-memory ProductTable.
+
+    Raises IngestError when no sheet of the workbook itself is usable, and
+    FileNotFoundError when it does not exist.
+    """
+    encoder = ColumnEncoder()
+    keys = {}  # row_key -> row id
+    rejects = RejectsReport(rejects_path)
+    stats = {"sheets": 0, "deltas": 0, "replaced": 0}
+    try:
+        for position, path in enumerate(source_files(file_path)):
+            delta = position > 0
+            stats["deltas"] += delta
+            for sheet, header, rows in iter_sheets(path):
+                missing = [column for column in SHEET_COLUMNS if column not in header]
+                if missing:
+                    rejects.add(path, sheet, 1, f"missing columns: {', '.join(missing)}")
+                    continue
+                stats["sheets"] += not delta
+                columns = [(i, column, column in KEY_COLUMNS) for i, column in enumerate(header) if column]
+                for column in header:
+                    if column:
+                        encoder.add_column(column)
+
+                for number, values in rows:
+                    row = {column: normalize_value(values[i], collapse) if i < len(values) else None
+                           for i, column, collapse in columns}
+                    if row.get("Category") is None:
+                        row["Category"] = "Unknown"
+                    empty = [column for column in REQUIRED_VALUES if row.get(column) is None]
+                    if empty:
+                        rejects.add(path, sheet, number, f"missing {', '.join(empty)}", row)
+                        continue
+
+                    key = row_key(row)
+                    existing = keys.get(key)
+                    if existing is None:
+                        keys[key] = encoder.append(row)
+                    elif delta:
+                        encoder.replace(existing, row)
+                        stats["replaced"] += 1
+                    else:
+                        rejects.add(path, sheet, number, "duplicate", row)
+
+        del keys  # only needed while reading
+        if not stats["sheets"]:
+            raise IngestError(f"no sheet of {file_path} has the required columns ({', '.join(SHEET_COLUMNS)})")
+    except BaseException:
+        rejects.close(keep=False)
+        raise
+    rejects.close()
+
+    table = encoder.table()
+    logger.info("Ingested %d products from %s (%d sheets, %d delta files, %d replaced, %d rejected)",
+                len(table), file_path, stats["sheets"], stats["deltas"], stats["replaced"], rejects.count,
+                extra=dict(stats, file=file_path, products=len(table), rejected=rejects.count))
+    if rejects.count and rejects_path:
+        logger.warning("%d rows of %s rejected, see %s", rejects.count, file_path, rejects_path)
+    return table
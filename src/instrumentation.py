@@ -0,0 +1,240 @@
+"""Metrics, Server-Timing headers and logging setup.
+
+Every server-side Dash callback is wrapped with `Instrumentation.callback()`,
+which records call counts, latency and errors; the response size is taken
+from the /_dash-update-component response. Metrics are served in Prometheus
+text format on /metrics, and each response carries a `Server-Timing` header
+with the callback and total request time.
+
+Metrics live in the worker process that served the request; every series is
+labelled with the worker pid so scrapes from different gunicorn workers do not
+collide.
+"""
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from flask import Response, g, request
+
+# Seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_STANDARD_LOG_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_LOG_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text with `extra=` fields appended as key=value pairs."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        extras = [f"{key}={value}" for key, value in vars(record).items()
+                  if key not in _STANDARD_LOG_ATTRS and not key.startswith("_")]
+        return " ".join([text] + extras)
+
+
+def configure_logging(level=None, fmt=None):
+    # LOG_LEVEL (default INFO) and LOG_FORMAT=text|json; per-request logs are DEBUG. Called when
+    # app.py is imported, so a root logger something else already set up (a test runner, a
+    # script embedding the app) is left as it is.
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.environ.get("LOG_FORMAT", "text")
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self, const_labels):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels, const_labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self, const_labels):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket"
+                                 f"{_labels(self.label_names, labels, list(const_labels) + [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket"
+                             f"{_labels(self.label_names, labels, list(const_labels) + [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels, const_labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels, const_labels)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callable at scrape time (catalogue size, cache stats...)."""
+
+    def __init__(self, name, help, read, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+
+    def expose(self, const_labels):
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name}{_labels((), (), const_labels)} {value}"]
+
+
+class Instrumentation:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.metrics = []
+        self.callback_calls = self.add(Counter(
+            "catalogue_callback_calls_total", "Dash callback invocations.", ["callback"]))
+        self.callback_errors = self.add(Counter(
+            "catalogue_callback_errors_total", "Dash callbacks that raised.", ["callback"]))
+        self.callback_latency = self.add(Histogram(
+            "catalogue_callback_duration_seconds", "Time spent inside Dash callbacks.", ["callback"]))
+        self.callback_payload = self.add(Histogram(
+            "catalogue_callback_response_bytes", "Uncompressed callback response size.", ["callback"],
+            buckets=SIZE_BUCKETS))
+        self.request_latency = self.add(Histogram(
+            "catalogue_http_request_duration_seconds", "HTTP request time by route.", ["route", "method", "status"]))
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, read, kind="gauge"):
+        return self.add(Gauge(name, help, read, kind))
+
+    def callback(self, name):
+        # Decorator for Dash callback functions (goes below @app.callback)
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    self.callback_errors.inc(name)
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - start
+                    self.callback_calls.inc(name)
+                    self.callback_latency.observe(elapsed, name)
+                    g.catalogue_callback = (name, elapsed)
+            return wrapper
+        return decorator
+
+    def init_app(self, server, path="/metrics"):
+        # Start the clock ahead of every other hook (304s answered in before_request count too);
+        # after_request handlers run in reverse, so registering after the compression layer
+        # means payload sizes are measured on the uncompressed body
+        server.before_request_funcs.setdefault(None, []).insert(0, self._before_request)
+        server.after_request(self._after_request)
+        server.add_url_rule(path, "catalogue_metrics", self.expose)
+
+    def _before_request(self):
+        g.catalogue_request_start = time.perf_counter()
+
+    def _after_request(self, response):
+        start = g.get("catalogue_request_start")
+        if not self.enabled or start is None:
+            return response
+        elapsed = time.perf_counter() - start
+
+        timings = []
+        callback = g.get("catalogue_callback")
+        if callback is not None:
+            name, seconds = callback
+            timings.append(f'cb;desc="{name}";dur={seconds * 1000:.2f}')
+            if not response.is_streamed:
+                self.callback_payload.observe(response.content_length or 0, name)
+        timings.append(f"total;dur={elapsed * 1000:.2f}")
+        response.headers.add("Server-Timing", ", ".join(timings))
+
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        self.request_latency.observe(elapsed, rule, request.method, response.status_code)
+        return response
+
+    def expose(self):
+        const_labels = [("worker", os.getpid())]
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.expose(const_labels))
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,67 @@
+"""Per-worker LRU of rendered page layouts.
+
+Entries are the plain JSON structure (dicts, lists, strings) of a page's
+component tree, not the JSON text: Dash serializes whatever a callback returns,
+so a cached layout is still encoded once per response. What the cache saves is
+building the components and converting them (to_plotly_json and the encoder's
+fallback walk over component objects), which is most of the cost: orjson
+encodes the plain structure of a category page in about 0.02ms, against about
+1ms to build and serialize its components.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+
+def serialize_component(component):
+    # Component tree -> the plain JSON structure Dash sends to the renderer
+    from plotly.utils import PlotlyJSONEncoder  # imports PIL, so only once a page is rendered
+
+    return json.loads(json.dumps(component, cls=PlotlyJSONEncoder))
+
+
+class LayoutCache:
+    """Bounded LRU of serialized page layouts.
+
+    Keys include the catalogue version, so a reload naturally stops hitting
+    old entries and they age out through eviction.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        # Build outside the lock; two concurrent misses just build the same value twice
+        value = serialize_component(build())
+        if self.max_entries <= 0:
+            return value
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,287 @@
+"""Background health checks of the product links (the workbook's URL column).
+
+Product pages load each product's URL into an iframe, so a dead or slow link
+only shows up as a blank frame. A checker thread in each worker runs an
+asyncio pass over the distinct URLs of its loaded catalogues every `interval`
+seconds, with at most `concurrency` requests in flight:
+
+- A HEAD request (GET when the server refuses HEAD) follows redirects; the
+  latency is the time until the final response's headers.
+- A link is `ok`, `slow` (over SLOW_SECONDS), `restricted` (401/403: the page
+  is up but needs a sign-in), `blocked` (the page refuses to be framed, by
+  X-Frame-Options or CSP frame-ancestors) or `broken` (connection error,
+  timeout, 404, 5xx...). A broken link only counts as down after BROKEN_AFTER
+  failed checks in a row, so one blip does not flag a product.
+
+The results are kept in one JSON file shared by the workers. A lock file lets
+only one worker run a pass per interval; the others load its results.
+"""
+import asyncio
+import json
+import logging
+import os
+import ssl
+import threading
+import time
+from urllib.parse import quote, urljoin, urlsplit
+
+from shared_files import file_lock, write_atomic
+
+logger = logging.getLogger(__name__)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS = os.path.join(script_dir, 'build', 'link-health.json')
+
+OK = "ok"
+SLOW = "slow"
+RESTRICTED = "restricted"
+BLOCKED = "blocked"
+BROKEN = "broken"
+
+CONCURRENCY = 16
+CHECK_TIMEOUT = 10
+SLOW_SECONDS = 3
+BROKEN_AFTER = 2
+MAX_REDIRECTS = 5
+# How often workers look for a pass finished by another worker
+POLL_INTERVAL = 60
+
+USER_AGENT = "iMMAP-Catalogue-LinkCheck/1.0"
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# Characters left as they are when a workbook URL is put on the request line
+_SAFE_CHARS = "/%?&=#:;@+,!$'()*[]~"
+
+
+class ProbeError(Exception):
+    pass
+
+
+async def _request(url, method):
+    # One request -> (status, headers with lowercased names); only the headers are read
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ProbeError("not an http(s) link")
+    https = parts.scheme == "https"
+    tls = {"ssl": ssl.create_default_context(), "server_hostname": parts.hostname} if https else {}
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or (443 if https else 80), **tls)
+    try:
+        target = quote((parts.path or "/") + (f"?{parts.query}" if parts.query else ""), safe=_SAFE_CHARS)
+        host = parts.netloc.rsplit("@", 1)[-1].encode("idna").decode("ascii")  # internationalized names
+        writer.write((f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+                      f"Accept: */*\r\nConnection: close\r\n\r\n").encode("ascii"))
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode("latin-1").split(None, 2)
+        if len(status_line) < 2 or not status_line[0].startswith("HTTP/") or not status_line[1].isdigit():
+            raise ProbeError("not an HTTP response")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            headers[name] = f"{headers[name]}, {value.strip()}" if name in headers else value.strip()
+        return int(status_line[1]), headers
+    finally:
+        writer.transport.abort()  # no TLS close handshake; only the headers were wanted
+
+
+async def probe(url):
+    # Final (status, headers, seconds) of a link, following redirects
+    start = time.perf_counter()
+    method = "HEAD"
+    for _ in range(MAX_REDIRECTS + 2):  # one extra round for a HEAD -> GET retry
+        status, headers = await _request(url, method)
+        if method == "HEAD" and status in (405, 501):
+            method = "GET"
+            continue
+        if status in REDIRECT_STATUSES and headers.get("location"):
+            url = urljoin(url, headers["location"])
+            continue
+        return status, headers, time.perf_counter() - start
+    raise ProbeError("too many redirects")
+
+
+def frame_blocked(headers):
+    # Whether the page forbids being shown in another site's iframe
+    if headers.get("x-frame-options", "").strip().lower() in ("deny", "sameorigin"):
+        return True
+    for directive in headers.get("content-security-policy", "").lower().split(";"):
+        directive = directive.split()
+        if directive[:1] == ["frame-ancestors"]:
+            return "*" not in directive[1:] and not any(source.startswith("http") for source in directive[1:])
+    return False
+
+
+def classify(status, headers, seconds):
+    if status in (401, 403):
+        return RESTRICTED
+    if not 200 <= status < 400:
+        return BROKEN
+    if frame_blocked(headers):
+        return BLOCKED
+    return SLOW if seconds > SLOW_SECONDS else OK
+
+
+async def check_url(url, timeout=CHECK_TIMEOUT):
+    try:
+        status, headers, seconds = await asyncio.wait_for(probe(url), timeout)
+    except asyncio.TimeoutError:
+        return {"state": BROKEN, "status": None, "latency": None, "error": f"no response in {timeout}s"}
+    except (OSError, EOFError, ValueError, ProbeError) as e:  # refused, DNS, TLS, cut off...
+        return {"state": BROKEN, "status": None, "latency": None, "error": str(e) or type(e).__name__}
+    return {"state": classify(status, headers, seconds), "status": status, "latency": round(seconds, 3),
+            "error": None}
+
+
+async def check_all(urls, concurrency=CONCURRENCY, timeout=CHECK_TIMEOUT):
+    # url -> result; `concurrency` workers share the list, so memory does not grow with it
+    results = {}
+    pending = iter(urls)
+
+    async def worker():
+        for url in pending:
+            results[url] = await check_url(url, timeout)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return results
+
+
+class LinkHealth:
+    """Latest check result per product link, refreshed by a background thread.
+
+    `urls()` returns the links to check (called at the start of each pass).
+    Readers get the current results without locking; a pass swaps in a new
+    dict when it is done.
+    """
+
+    def __init__(self, urls, path=DEFAULT_RESULTS, interval=3600, concurrency=CONCURRENCY,
+                 timeout=CHECK_TIMEOUT):
+        self.urls = urls
+        self.path = path
+        self.interval = interval
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        self.results = {}  # url -> {"state", "status", "latency", "error", "failures", "checked_at"}
+        self.checked_at = None  # end of the last pass (any worker's)
+        self.seconds = None  # its duration
+        self.passes = 0  # passes run by this worker
+
+        self._mtime = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name="link-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.is_set():
+            try:
+                self.load()
+                if self._due():
+                    self.run()
+            except Exception as e:  # keep checking on the next round
+                logger.exception("Link check failed: %s", e)
+            self._stop.wait(min(self.interval, POLL_INTERVAL))
+
+    def _due(self):
+        return self.checked_at is None or time.time() - self.checked_at >= self.interval
+
+    def load(self):
+        # Pick up results written by any worker since the last load
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.results = data.get("results", {})
+        self.checked_at = data.get("checked_at")
+        self.seconds = data.get("seconds")
+        self._mtime = mtime
+
+    def run(self):
+        # One pass over the links, unless another worker is running one -> whether it ran
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Without fcntl (Windows) the lock is always acquired and every worker runs its own passes
+        with file_lock(self.path + ".lock", blocking=False) as locked:
+            if not locked:
+                return False
+            self.load()  # another worker may have just finished a pass
+            if not self._due():
+                return False
+
+            urls = sorted({url.strip() for url in self.urls() if isinstance(url, str) and url.strip()})
+            start = time.perf_counter()
+            checked = asyncio.run(check_all(urls, self.concurrency, self.timeout))
+            seconds = round(time.perf_counter() - start, 3)
+            now = time.time()
+
+            results = {}
+            for url, result in checked.items():
+                failures = self.results.get(url, {}).get("failures", 0) + 1 if result["state"] == BROKEN else 0
+                results[url] = dict(result, failures=failures, checked_at=now)
+            # Links only other workers have loaded (other country offices) are kept for a while
+            for url, result in self.results.items():
+                if url not in results and now - result.get("checked_at", 0) < 3 * self.interval:
+                    results[url] = result
+            self._write({"checked_at": now, "seconds": seconds, "results": results})
+
+            self.results, self.checked_at, self.seconds = results, now, seconds
+            self.passes += 1
+            problems = sum(1 for url in checked if self.problem(url))
+            logger.info("Checked %d links in %.1fs (%d with problems)", len(checked), seconds, problems,
+                        extra={"links": len(checked), "link_problems": problems, "seconds": seconds})
+            return True
+
+    def _write(self, data):
+        write_atomic(self.path, json.dumps(data))
+        self._mtime = os.path.getmtime(self.path)
+
+    def problem(self, url):
+        # State of a link that needs flagging (BROKEN only once it failed BROKEN_AFTER times); None if fine
+        result = self.results.get(url)
+        if result is None or result["state"] == OK:
+            return None
+        if result["state"] == BROKEN and result.get("failures", 0) < BROKEN_AFTER:
+            return None
+        return result["state"]
+
+    def is_down(self, url):
+        return self.problem(url) == BROKEN
+
+    def stats(self):
+        states = {}
+        for result in self.results.values():
+            states[result["state"]] = states.get(result["state"], 0) + 1
+        return {
+            "enabled": self.enabled,
+            "interval": self.interval,
+            "links": len(self.results),
+            "states": states,
+            "down": sum(1 for url in self.results if self.is_down(url)),
+            "checked_at": self.checked_at,
+            "seconds": self.seconds,
+            "passes": self.passes,
+        }
+
+    def problems(self):
+        # Flagged links with their last result, worst first
+        order = {BROKEN: 0, RESTRICTED: 1, BLOCKED: 2, SLOW: 3}
+        flagged = [(url, self.problem(url)) for url in self.results]
+        return [dict(self.results[url], url=url) for url, problem in
+                sorted((item for item in flagged if item[1]), key=lambda item: (order[item[1]], item[0]))]
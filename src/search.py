@@ -0,0 +1,280 @@
+import heapq
+import math
+import operator
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from columnar import StringArray, encode_strings
+
+# Fields indexed for search, with their ranking weight
+SEARCH_FIELDS = {
+    "Title": 3.0,
+    "Category": 2.0,
+    "Sector": 2.0,
+    "Year": 1.5,
+    "Description": 1.0,
+}
+
+# Shorter prefixes only match whole terms (a single letter would expand to most of the vocabulary)
+MIN_PREFIX = 2
+# Cap on vocabulary terms a single prefix may expand to, and on the postings they may pull in;
+# type-ahead narrows as the user keeps typing, so a short prefix only needs a good first page
+MAX_PREFIX_TERMS = 200
+MAX_PREFIX_POSTINGS = 2000
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    # Lowercase, strip accents and split on anything that is not a letter/digit ("2024/2025" -> 2024, 2025)
+    if text is None:
+        return []
+    text = str(text).casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
+
+
+def _analyze(product):
+    # term -> weight for one product (best field wins, repeats add a little)
+    weights = {}
+    for field, field_weight in SEARCH_FIELDS.items():
+        for term in tokenize(product.get(field)):
+            current = weights.get(term)
+            weights[term] = field_weight if current is None else max(current, field_weight) + 0.1
+    return weights
+
+
+def _changed_rows(products, previous, rows, previous_rows, limit):
+    # Rows whose postings cannot be copied from the previous snapshot: indexed in only one of
+    # the two, or with a searchable value that differs from the same row there. Values are
+    # compared through the columns' dictionary codes, so unchanged rows are never decoded.
+    # None once more than `limit` rows changed (a full pass is then simpler and no slower).
+    changed = set(rows).symmetric_difference(previous_rows)
+    shared = min(len(products), len(previous))
+    for field in SEARCH_FIELDS:
+        present = (field in products.columns, field in previous.columns)
+        if present == (False, False):
+            continue
+        if present != (True, True):
+            return None
+        codes, values = products.encoding(field)
+        previous_codes, previous_values = previous.encoding(field)
+        previous_code = {}
+        for code in range(len(previous_values)):
+            previous_code.setdefault(previous_values[code], code)
+        translated = [previous_code.get(values[code], -1) for code in range(len(values))]
+        changed.update(row for row, (code, old) in
+                       enumerate(zip(codes[:shared].tolist(), previous_codes[:shared].tolist()))
+                       if translated[code] != old)
+        if len(changed) > limit:
+            return None
+    return changed if len(changed) <= limit else None
+
+
+def index_sections(products, rows, previous=None):
+    # Search postings of `rows` (row ids, ascending) -> sections stored with the catalogue:
+    # sorted vocabulary, and for each term its postings (row ids and weights, by row id).
+    # With the `previous` table (the snapshot being replaced), only rows that changed are
+    # tokenized again; the postings of terms they do not touch are copied as they are.
+    previous_index = SearchIndex(previous) if previous is not None else None
+    changed = None
+    if previous_index is not None and previous_index.documents:
+        previous_rows = previous.section("index:order")
+        changed = _changed_rows(products, previous, rows, [] if previous_rows is None else previous_rows.tolist(),
+                                limit=len(rows) // 2)
+
+    postings = {}
+    for row in (rows if changed is None else sorted(changed.intersection(rows))):
+        for term, weight in _analyze(products[row]).items():
+            postings.setdefault(term, []).append((row, weight))
+
+    previous_terms = {}
+    touched = set(postings)
+    if changed is not None:
+        terms = previous_index.terms
+        previous_terms = {terms[i]: i for i in range(len(terms))}
+        for row in changed:
+            if row < len(previous):
+                touched.update(_analyze(previous[row]))
+
+    blob_terms = []
+    postings_offsets = array("I", [0])
+    doc_ids = array("I")
+    weights = array("f")
+    for term in sorted(touched.union(previous_terms)):
+        i = previous_terms.get(term)
+        if i is not None and term not in touched:
+            start, end = previous_index.postings_offsets[i], previous_index.postings_offsets[i + 1]
+            doc_ids.extend(previous_index.doc_ids[start:end])
+            weights.extend(previous_index.weights[start:end])
+        else:
+            entries = postings.get(term, [])
+            if i is not None:
+                # Unchanged rows keep their old postings; changed ones were analysed again above
+                old_ids, old_weights = previous_index._postings(i)
+                entries = sorted(entries + [(row, weight) for row, weight in
+                                            zip(old_ids.tolist(), old_weights.tolist()) if row not in changed])
+            if not entries:
+                continue
+            for row, weight in entries:
+                doc_ids.append(row)
+                weights.append(weight)
+        blob_terms.append(term)
+        postings_offsets.append(len(doc_ids))
+
+    blob, term_offsets = encode_strings(blob_terms)
+    return {
+        "search:terms": blob,
+        "search:term_offsets": term_offsets,
+        "search:postings": postings_offsets,
+        "search:docs": doc_ids,
+        "search:weights": weights,
+    }
+
+
+class SearchIndex:
+    """Inverted index over a ProductTable.
+
+    The vocabulary and postings are arrays stored next to the columns (see
+    `index_sections`), so a mapped snapshot shares them between workers and
+    opening the index costs nothing per product.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.documents = products.meta.get("documents", 0)
+        if products.section("search:terms") is None:
+            self.terms = []
+            self.postings_offsets = array("I", [0])
+            self.doc_ids = array("I")
+            self.weights = array("f")
+        else:
+            self.terms = StringArray(products.section("search:terms"), products.section("search:term_offsets"))
+            self.postings_offsets = products.section("search:postings")
+            self.doc_ids = products.section("search:docs")
+            self.weights = products.section("search:weights")
+
+    def _find(self, token):
+        # Position of the first vocabulary term >= token
+        lo, hi = 0, len(self.terms)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.terms[mid] < token:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _postings(self, i):
+        start, end = self.postings_offsets[i], self.postings_offsets[i + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def _expand(self, token, prefix):
+        # Vocabulary term positions matching `token`, with exact matches ranked above prefix matches
+        matches = []
+        start = self._find(token)
+        terms = self.terms
+        if start < len(terms) and terms[start] == token:
+            matches.append((start, 1.0))
+            start += 1
+        if prefix and len(token) >= MIN_PREFIX:
+            budget = MAX_PREFIX_POSTINGS
+            for i in range(start, min(start + MAX_PREFIX_TERMS, len(terms))):
+                if budget <= 0 or not terms[i].startswith(token):
+                    break
+                matches.append((i, 0.7))
+                budget -= self.postings_offsets[i + 1] - self.postings_offsets[i]
+        return matches
+
+    def _count(self, matches):
+        # Postings of a token's matched terms
+        return sum(self.postings_offsets[term + 1] - self.postings_offsets[term] for term, _ in matches)
+
+    def _scores(self, matches):
+        # doc_id -> a token's score: its best matching term's weight x idf. Built in C, as a common
+        # exact term ("2024") has a posting for a fifth of the catalogue; prefix expansions (at most
+        # MAX_PREFIX_POSTINGS) are merged in afterwards.
+        scores = None
+        for term, factor in matches:
+            doc_ids, weights = self._postings(term)
+            term_scores = dict(zip(doc_ids.tolist(), map(factor.__mul__, weights.tolist())))
+            if scores is None:
+                scores = term_scores
+                continue
+            for doc_id, score in term_scores.items():
+                if score > scores.get(doc_id, 0):
+                    scores[doc_id] = score
+        return scores
+
+    def _intersect(self, results, matches):
+        # `results` narrowed to the products one more token matches, with its score added. Only the
+        # products already in `results` are looked up (by bisection in the sorted postings).
+        scores = {}
+        for term, factor in matches:
+            doc_ids, weights = self._postings(term)
+            for doc_id in results.keys() & doc_ids.tolist():
+                score = weights[bisect_left(doc_ids, doc_id)] * factor
+                if score > scores.get(doc_id, 0):
+                    scores[doc_id] = score
+        return {doc_id: results[doc_id] + score for doc_id, score in scores.items()}
+
+    def _top(self, matches, limit):
+        # Best (score, -doc_id) of a one-token query without scoring every posting. Within a term the
+        # score is weight x idf, and weights take a few values (see _analyze), so each term's best
+        # postings are found by scanning for its highest weights; a product's best term wins.
+        best = {}
+        for term, factor in matches:
+            doc_ids, weights = self._postings(term)
+            weights = weights.tolist()
+            found = 0
+            for weight in sorted(set(weights), reverse=True):
+                position = -1
+                while found < limit:
+                    try:
+                        position = weights.index(weight, position + 1)
+                    except ValueError:
+                        break
+                    doc_id = doc_ids[position]
+                    if weight * factor > best.get(doc_id, 0):
+                        best[doc_id] = weight * factor
+                    found += 1
+                if found >= limit:
+                    break
+        return heapq.nlargest(limit, zip(best.values(), map(operator.neg, best)))
+
+    def search(self, query, limit=10, prefix=True):
+        # All query tokens must match, the last one (and any of 3+ letters) also as a prefix for
+        # type-ahead; results are ranked by field-weighted idf
+        tokens = tokenize(query)
+        if not tokens or not self.documents:
+            return []
+
+        # (term, weight factor) of every term each token matches
+        total = self.documents
+        token_matches = []
+        for i, token in enumerate(tokens):
+            matches = []
+            for term, match_weight in self._expand(token, prefix and (i == len(tokens) - 1 or len(token) >= 3)):
+                postings = self.postings_offsets[term + 1] - self.postings_offsets[term]
+                matches.append((term, math.log(1 + total / postings) * match_weight))
+            if not matches:
+                return []
+            token_matches.append(matches)
+
+        if len(token_matches) == 1:
+            ranked = self._top(token_matches[0], limit)
+        else:
+            # Intersect starting from the most selective token
+            token_matches.sort(key=self._count)
+            results = self._scores(token_matches[0])
+            for matches in token_matches[1:]:
+                results = self._intersect(results, matches)
+                if not results:
+                    return []
+            # Best score first, then catalogue order (-doc_id, so the tuples compare without a key function)
+            ranked = heapq.nlargest(limit, zip(results.values(), map(operator.neg, results)))
+        return [self.products[-negated_id] for _, negated_id in ranked]
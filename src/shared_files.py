@@ -0,0 +1,84 @@
+"""Files shared between processes: atomic replacement and lock files.
+
+Snapshots, rejects reports, the thumbnail cache, the link check results and
+the static export are read by other workers (or a web server) while they are
+rewritten. They are written to a temporary file in the same directory and
+renamed over the target, so a reader sees either the old file or the new one,
+never a partial write. Lock files let the workers of a host take turns.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows; locks are then no-ops and every worker goes ahead
+    fcntl = None
+
+
+class AtomicFile:
+    """Temporary file next to `path` that replaces it on `commit()`.
+
+    As a context manager it yields the open file and commits when the block
+    ends normally; on an exception (or `discard()`) the target is left as it
+    was and the temporary file is removed. Committed files are world-readable.
+    """
+
+    def __init__(self, path, mode="wb", **kwargs):
+        self.path = path
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        self.file = os.fdopen(fd, mode, **kwargs)
+
+    def commit(self):
+        try:
+            self.file.close()
+            os.chmod(self.tmp_path, 0o644)
+            os.replace(self.tmp_path, self.path)
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+def write_atomic(path, data):
+    # Replace `path` with `data` (bytes, or text written as UTF-8)
+    with AtomicFile(path) as f:
+        f.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    # Exclusive lock shared by the workers of this host -> whether it was acquired. Blocking locks
+    # wait for it; with blocking=False another holder means False. Always True without fcntl.
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,117 @@
+"""Compiled catalogue snapshot.
+
+products.xlsx is compiled into one binary column file (see columnar.py): the
+dictionary-encoded rows plus the category index and search postings. Workers
+map the file read-only instead of parsing it, so loading costs next to nothing,
+needs only the stdlib (no openpyxl, no zipped workbook XML), and every worker
+shares the same pages from the OS page cache. The snapshot records the content
+hash of the workbook (and its delta files) it was built from and is ignored once
+they change. The workbook is read by the streaming ingestion in ingest.py, which
+writes the rows it rejected to a report next to the snapshot.
+
+Build it as part of the deploy:
+
+    python src/snapshot.py [products.xlsx] [products.snapshot]
+
+Without arguments it also compiles every country-office workbook (see tenants.py).
+"""
+import logging
+import os
+import sys
+
+from catalogue import build_table, pack_catalogue
+from columnar import ProductTable
+from data_version import file_version
+from ingest import ingest
+from shared_files import write_atomic
+from tenants import TENANTS_DIR, discover
+
+logger = logging.getLogger(__name__)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.join(script_dir, 'assets', 'products.xlsx')
+# Kept out of assets/ so the snapshot is not served as a static file
+DEFAULT_SNAPSHOT = os.environ.get("CATALOGUE_SNAPSHOT", os.path.join(script_dir, 'build', 'products.snapshot'))
+
+SNAPSHOT_FORMAT = "2"
+
+
+def tenant_snapshot(tenant):
+    # The default catalogue uses DEFAULT_SNAPSHOT; each tenant gets its own file next to it
+    if not tenant:
+        return DEFAULT_SNAPSHOT
+    return os.path.join(os.path.dirname(DEFAULT_SNAPSHOT), f"tenant-{tenant}.snapshot")
+
+
+def rejects_report(snapshot_path=DEFAULT_SNAPSHOT):
+    # build/products.snapshot -> build/products.rejects.csv
+    return os.path.splitext(snapshot_path)[0] + ".rejects.csv"
+
+
+def write_snapshot(products, columns, source_version, snapshot_path=DEFAULT_SNAPSHOT):
+    # Written to a temp file and renamed, so a worker never sees a half-written snapshot
+    # (and workers still mapping the previous one keep reading the old file). The search
+    # postings of rows that did not change are taken from the snapshot being replaced.
+    data = pack_catalogue(products, columns, meta={"format": SNAPSHOT_FORMAT, "source_version": source_version},
+                          previous=read_snapshot(snapshot_path))
+    write_atomic(snapshot_path, data)
+
+
+def read_snapshot(snapshot_path=DEFAULT_SNAPSHOT, source_version=None):
+    # Returns the mapped ProductTable, or None if the snapshot is missing, unreadable or stale
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        table = ProductTable.open(snapshot_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Ignoring unreadable catalogue snapshot %s: %s", snapshot_path, e)
+        return None
+    if table.meta.get("format") != SNAPSHOT_FORMAT:
+        return None
+    if source_version is not None and table.meta.get("source_version") != source_version:
+        return None
+    return table
+
+
+def read_workbook(file_path, snapshot_path=DEFAULT_SNAPSHOT):
+    # Stream the workbook and its delta files into an in-memory table (see ingest.py)
+    return ingest(file_path, rejects_report(snapshot_path))
+
+
+def build_snapshot(file_path=DEFAULT_SOURCE, snapshot_path=DEFAULT_SNAPSHOT):
+    version = file_version(file_path)
+    products = read_workbook(file_path, snapshot_path)
+    write_snapshot(products, products.columns, version, snapshot_path)
+    return products
+
+
+def load_products(file_path=DEFAULT_SOURCE, snapshot_path=DEFAULT_SNAPSHOT):
+    # Fast path: a snapshot built from this exact workbook
+    version = file_version(file_path)
+    products = read_snapshot(snapshot_path, version)
+    if products is not None:
+        return products
+
+    # Stale or missing: fall back to the workbook and refresh the snapshot for the next boot
+    products = read_workbook(file_path, snapshot_path)
+    try:
+        write_snapshot(products, products.columns, version, snapshot_path)
+    except OSError as e:
+        logger.warning("Could not write catalogue snapshot %s: %s", snapshot_path, e)
+    else:
+        table = read_snapshot(snapshot_path, version)
+        if table is not None:
+            return table  # mapped, so this worker shares it too
+    return build_table(products, products.columns)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        targets = [(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SNAPSHOT)]
+    else:
+        # The default catalogue and every country-office workbook
+        targets = [(DEFAULT_SOURCE, DEFAULT_SNAPSHOT)]
+        targets += [(path, tenant_snapshot(name)) for name, path in discover(TENANTS_DIR).items()]
+    for source, target in targets:
+        rows = build_snapshot(source, target)
+        print(f"Wrote {len(rows)} products to {target}")
@@ -0,0 +1,77 @@
+"""Boot phases and the cold-start mode.
+
+`StartupProfiler` records the wall time of each phase of a worker's boot
+(process start until app.py runs, imports, app setup, catalogue load,
+warm-up). The phases are logged once the worker is ready and served on
+/healthz, and the benchmark records them, so boot time can be compared
+between releases.
+
+With STARTUP_MODE=lazy, app.py finishes importing without loading the
+catalogue. The catalogue load and a warm-up pass (first serialization, page
+shell and homepage layout) run in a background thread. Meanwhile /healthz
+answers, and other requests wait until the worker is ready.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+EAGER = "eager"
+LAZY = "lazy"
+
+
+def process_age():
+    # Seconds since this process started (interpreter and gunicorn boot included); Linux only
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name can contain spaces, so count fields after its closing parenthesis
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(uptime - started, 0.0)
+
+
+class StartupProfiler:
+    """Wall time per boot phase; a phase ends when the next one is marked."""
+
+    def __init__(self):
+        before = process_age()
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.phases = [("process", round(before, 3))] if before is not None else []
+        self.ready = threading.Event()
+        self._last = self.started
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        # Ends `phase` now; it covers the time since the previous mark
+        with self._lock:
+            now = time.perf_counter()
+            self.phases.append((phase, round(now - self._last, 3)))
+            self._last = now
+
+    def done(self):
+        self.ready.set()
+        phases = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in self.phases)
+        logger.info("Worker ready in %.3fs (%s)", self.seconds, phases,
+                    extra={"startup": dict(self.phases), "startup_seconds": self.seconds})
+
+    @property
+    def seconds(self):
+        # Total boot time, including the process phase
+        with self._lock:
+            return round(sum(seconds for _, seconds in self.phases), 3)
+
+    def report(self):
+        with self._lock:
+            phases = [{"phase": phase, "seconds": seconds} for phase, seconds in self.phases]
+        return {
+            "ready": self.ready.is_set(),
+            "seconds": self.seconds,
+            "started_at": self.started_at,
+            "phases": phases,
+        }
@@ -0,0 +1,236 @@
+// Page script of the static export (python src/export.py): the category dropdowns, the search box
+// and the homepage carousel, from the exported JSON files instead of the Dash callbacks
+(function() {
+    "use strict";
+
+    const page = JSON.parse(document.getElementById("catalogue-page").textContent);
+    const GROUP_KEY_SEPARATOR = "\u001f";
+    const requests = {};
+
+    function fetchJSON(url) {
+        // One request per file; shards have content-hashed names, so they never change
+        if (!requests[url]) {
+            requests[url] = fetch(url).then(function(response) {
+                if (!response.ok) {
+                    throw new Error(url + ": " + response.status);
+                }
+                return response.json();
+            });
+        }
+        return requests[url];
+    }
+
+    function key(value) {
+        return value === null || value === undefined ? "" : String(value);
+    }
+
+    function element(tag, className, text) {
+        const node = document.createElement(tag);
+        if (className) {
+            node.className = className;
+        }
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    // Same rules as CatalogueIndex.resolve: a missing value gets the first option when filling,
+    // a value that no longer applies falls back to the first option
+    function matchOption(options, value, fill) {
+        if (value === null || value === undefined || value === "") {
+            return fill && options.length ? options[0] : null;
+        }
+        for (let i = 0; i < options.length; i++) {
+            if (key(options[i]) === key(value)) {
+                return options[i];
+            }
+        }
+        return options.length ? options[0] : null;
+    }
+
+    function resolve(index, sector, year, title, fill) {
+        sector = matchOption(index.sectors, sector, fill);
+        const years = sector === null ? [] : index.years[key(sector)] || [];
+        year = matchOption(years, year, fill);
+        const shard = year === null ? null : index.shards[key(sector) + GROUP_KEY_SEPARATOR + key(year)];
+        return (shard ? fetchJSON(shard) : Promise.resolve([])).then(function(products) {
+            const titles = products.map(function(product) { return product[0]; });
+            title = matchOption(titles, title, fill);
+            return {
+                sector: sector, years: years, year: year, titles: titles, title: title,
+                product: title === null ? null : products[titles.indexOf(title)]
+            };
+        });
+    }
+
+    function setOptions(select, values, selected) {
+        const placeholder = select.options.length ? select.options[0].textContent : "";
+        select.textContent = "";
+        select.appendChild(new Option(placeholder, ""));
+        values.forEach(function(value) {
+            select.appendChild(new Option(key(value), key(value)));
+        });
+        select.value = key(selected);
+        select.disabled = !values.length;
+    }
+
+    function showAbout(about, product) {
+        // Same markup as product_about() in app.py; product = [title, url, description, path]
+        about.textContent = "";
+        if (!product) {
+            about.appendChild(element("p", "floating-text", "Select all filters to see product information."));
+            return;
+        }
+        const content = element("div");
+        content.appendChild(element("h3", "floating-title", "About This Product"));
+        content.appendChild(element("p", "floating-text", product[2] || "No description available."));
+        about.appendChild(content);
+    }
+
+    function setupCategory(category) {
+        const sectorSelect = document.getElementById("sector-dropdown");
+        const yearSelect = document.getElementById("year-dropdown");
+        const titleSelect = document.getElementById("product-dropdown");
+        const iframe = document.getElementById("product-iframe");
+        const about = document.getElementById("floating-about");
+        if (!sectorSelect || !yearSelect || !titleSelect) {
+            return;
+        }
+        let latest = 0;
+
+        function show(index, sector, year, title, fill) {
+            // Later changes win over slower shard loads of earlier ones
+            const request = ++latest;
+            return resolve(index, sector, year, title, fill).then(function(selection) {
+                if (request !== latest) {
+                    return;
+                }
+                setOptions(sectorSelect, index.sectors, selection.sector);
+                setOptions(yearSelect, selection.years, selection.year);
+                setOptions(titleSelect, selection.titles, selection.title);
+                const src = selection.product && selection.product[1] ? selection.product[1] : page.loading;
+                if (iframe && iframe.getAttribute("src") !== src) {
+                    iframe.setAttribute("src", src);
+                }
+                if (about) {
+                    showAbout(about, selection.product);
+                }
+                // The address bar follows the selection, so it can be shared like the app's deep links
+                const path = selection.product ? selection.product[3] : category.path;
+                if (window.location.pathname !== path || window.location.search) {
+                    window.history.replaceState(null, "", path);
+                }
+            });
+        }
+
+        fetchJSON(category.index).then(function(index) {
+            // The app's deep links (?sector=&year=&title=) work on the exported category pages too
+            const query = new URLSearchParams(window.location.search);
+            const linked = query.has("sector") || query.has("year") || query.has("title");
+            return show(index, linked ? query.get("sector") : category.sector, linked ? query.get("year") : category.year,
+                        linked ? query.get("title") : category.title, true).then(function() {
+                [sectorSelect, yearSelect, titleSelect].forEach(function(select) {
+                    select.addEventListener("change", function() {
+                        // A dropdown the user just cleared stays cleared (and so does everything below it)
+                        show(index, sectorSelect.value || null, yearSelect.value || null, titleSelect.value || null,
+                             select.value !== "");
+                    });
+                });
+            });
+        }).catch(function(error) {
+            console.error("Could not load the category data", error);
+        });
+    }
+
+    function setupSearch() {
+        const input = document.getElementById("search-input");
+        const results = document.getElementById("search-results");
+        if (!input || !results || !page.search) {
+            return;
+        }
+        input.addEventListener("input", function() {
+            const query = input.value.trim().toLowerCase();
+            // Like the app, no result list until the query is long enough to look up
+            if (query.length < page.searchMinLength) {
+                results.textContent = "";
+                return;
+            }
+            // Every word of the query must appear in the title or the category/sector/year
+            const words = query.split(/\s+/);
+            fetchJSON(page.search).then(function(entries) {
+                if (input.value.trim().toLowerCase() !== query) {
+                    return;
+                }
+                const found = [];
+                for (let i = 0; i < entries.length && found.length < page.searchResults; i++) {
+                    const text = (entries[i][0] + " " + entries[i][1]).toLowerCase();
+                    if (words.every(function(word) { return text.indexOf(word) !== -1; })) {
+                        found.push(entries[i]);
+                    }
+                }
+                results.textContent = "";
+                if (!found.length) {
+                    results.appendChild(element("p", "search-empty", "No products found."));
+                    return;
+                }
+                found.forEach(function(entry) {
+                    // Same markup as result_link() in app.py; entry = [title, meta, path]
+                    const link = element("a", "search-result");
+                    link.href = entry[2];
+                    link.appendChild(element("span", "search-result-title", entry[0]));
+                    link.appendChild(element("span", "search-result-meta", entry[1]));
+                    results.appendChild(link);
+                });
+            });
+        });
+    }
+
+    function setupCarousel() {
+        // Same rotation as update_carousel in assets/script.js
+        const data = document.getElementById("carousel-images");
+        const image = document.getElementById("carousel-image");
+        if (!data || !image) {
+            return;
+        }
+        const images = JSON.parse(data.textContent);
+        const avif = document.getElementById("carousel-source-avif");
+        const webp = document.getElementById("carousel-source-webp");
+        let index = 0;
+        let fade = false;
+        let timer = null;
+
+        function show(next) {
+            index = (next + images.length) % images.length;
+            const slide = images[index];
+            image.src = slide.src;
+            image.srcset = slide.srcSet || "";
+            if (avif) {
+                avif.srcset = slide.avif || "";
+            }
+            if (webp) {
+                webp.srcset = slide.webp || "";
+            }
+            fade = !fade;
+            image.className = fade ? "carousel-image fade-alt" : "carousel-image fade";
+        }
+
+        function restart() {
+            clearInterval(timer);
+            timer = setInterval(function() { show(index + 1); }, 5000);
+        }
+
+        if (!images.length) {
+            return;
+        }
+        document.getElementById("prev-btn").addEventListener("click", function() { show(index - 1); restart(); });
+        document.getElementById("next-btn").addEventListener("click", function() { show(index + 1); restart(); });
+        restart();
+    }
+
+    if (page.category) {
+        setupCategory(page.category);
+    }
+    setupSearch();
+    setupCarousel();
+})();
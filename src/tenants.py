@@ -0,0 +1,152 @@
+"""Several country-office catalogues served from one deployment.
+
+Every workbook in the tenants directory (`<dir>/<name>.xlsx`) is a tenant whose
+pages live under `/<name>/...`; the default catalogue keeps the root paths. A
+tenant's CatalogueStore (mapped snapshot, index, reload watcher) is created on
+first access and the least recently used ones are dropped again once the loaded
+snapshots exceed the memory budget. The default catalogue is never evicted.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+# One workbook per country office, next to the default products.xlsx
+TENANTS_DIR = os.environ.get("CATALOGUE_TENANTS_DIR", os.path.join(script_dir, 'assets', 'tenants'))
+
+DEFAULT_TENANT = ""
+
+# Tenant names double as URL path segments
+_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+
+
+def discover(directory):
+    # name -> workbook for every .xlsx in `directory` ("Nigeria.xlsx" -> "nigeria")
+    tenants = {}
+    if not directory or not os.path.isdir(directory):
+        return tenants
+    for filename in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(filename)
+        name = stem.lower().replace(" ", "-")
+        if ext.lower() == ".xlsx" and _NAME_RE.match(name) and not filename.startswith("~$"):
+            tenants[name] = os.path.join(directory, filename)
+    return tenants
+
+
+class TenantRegistry:
+    """Lazily loaded CatalogueStores, one per tenant, under a memory budget.
+
+    `make_store(name, file_path)` builds (and starts) the store for a tenant.
+    The budget counts the size of each loaded snapshot, which is what a tenant
+    adds to a worker; at least one tenant besides the pinned ones stays loaded.
+    """
+
+    def __init__(self, files, make_store, max_bytes, pinned=(DEFAULT_TENANT,)):
+        self.files = dict(files)
+        self.make_store = make_store
+        self.max_bytes = max_bytes
+        self.pinned = set(pinned)
+
+        self._stores = OrderedDict()  # name -> store, least recently used first
+        self._lock = threading.Lock()
+        self._loading = {name: threading.Lock() for name in self.files}
+        self._stats = {name: {"requests": 0, "loads": 0, "evictions": 0, "load_seconds": None,
+                              "last_used": None} for name in self.files}
+
+    def __contains__(self, name):
+        return name in self.files
+
+    @property
+    def names(self):
+        return [name for name in self.files if name != DEFAULT_TENANT]
+
+    def store(self, name):
+        # The tenant's store, loading it on first use; KeyError for unknown tenants
+        if name not in self.files:
+            raise KeyError(name)
+        stats = self._stats[name]
+        with self._lock:
+            stats["requests"] += 1
+            stats["last_used"] = time.time()
+            store = self._stores.get(name)
+            if store is not None:
+                self._stores.move_to_end(name)
+                return store
+
+        # One load per tenant at a time; other tenants keep being served meanwhile
+        with self._loading[name]:
+            with self._lock:
+                store = self._stores.get(name)
+                if store is not None:
+                    return store
+            start = time.perf_counter()
+            store = self.make_store(name, self.files[name])
+            with self._lock:
+                stats["loads"] += 1
+                stats["load_seconds"] = round(time.perf_counter() - start, 3)
+                self._stores[name] = store
+                evicted = self._evict_over_budget(keep=name)
+        for old in evicted:
+            old.stop()
+        return store
+
+    def current(self, name):
+        return self.store(name).current()
+
+    def loaded(self):
+        # Stores loaded right now, without touching their LRU order
+        with self._lock:
+            return list(self._stores.values())
+
+    def evict(self, name):
+        if name in self.pinned:
+            return False
+        with self._lock:
+            store = self._stores.pop(name, None)
+            if store is not None:
+                self._stats[name]["evictions"] += 1
+        if store is None:
+            return False
+        store.stop()
+        return True
+
+    def _evict_over_budget(self, keep):
+        # Caller holds the lock. In-flight requests keep their snapshot until they finish.
+        evicted = []
+        loaded = sum(_store_bytes(store) for store in self._stores.values())
+        for name in list(self._stores):
+            if loaded <= self.max_bytes:
+                break
+            if name in self.pinned or name == keep:
+                continue
+            store = self._stores.pop(name)
+            loaded -= _store_bytes(store)
+            self._stats[name]["evictions"] += 1
+            evicted.append(store)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            loaded = dict(self._stores)
+            tenants = {}
+            for name in self.files:
+                entry = dict(self._stats[name], loaded=name in loaded, bytes=0)
+                store = loaded.get(name)
+                if store is not None:
+                    store_stats = store.stats()
+                    entry.update(bytes=store_stats["bytes"], version=store_stats["version"],
+                                 products=store_stats["products"])
+                tenants[name or "default"] = entry
+        return {
+            "loaded": len(loaded),
+            "loaded_bytes": sum(_store_bytes(store) for store in loaded.values()),
+            "max_bytes": self.max_bytes,
+            "tenants": tenants,
+        }
+
+
+def _store_bytes(store):
+    # Without waiting for a store that is still loading
+    return store.stats()["bytes"]
@@ -0,0 +1,79 @@
+"""Shared test fixtures.
+
+The app modules are imported from src/, as gunicorn (--chdir src) does, and
+outgoing requests go to a local stub server instead of the real hosts.
+"""
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+class StubServer:
+    """HTTP server on a free local port answering from `routes`.
+
+    routes: path -> function(method) -> (status, headers, body); other paths
+    get a 404. Every request is recorded in `requests` as (method, path).
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def answer(self):
+                stub.requests.append((self.command, self.path))
+                route = stub.routes.get(self.path.split("?", 1)[0])
+                status, headers, body = route(self.command) if route else (404, {}, b"")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            do_GET = do_HEAD = answer
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                pass  # clients that hang up after the headers (the link checker does)
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def count(self, path, method="GET"):
+        return sum(1 for request in self.requests if request == (method, path))
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    # stub_server(routes) -> a running StubServer, shut down after the test
+    servers = []
+
+    def start(routes):
+        server = StubServer(routes)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+from flask import Flask
+
+from api import CatalogueAPI, encode_cursor
+from catalogue import Catalogue, normalize_category
+
+
+def product(i, category, sector, year):
+    return {"Title": f"{category} {sector} {year} {i}", "Year": year, "Sector": sector, "Category": category,
+            "URL": f"https://example.org/{i}", "Image_URL": "", "Description": f"Product {i}"}
+
+
+# 12 dashboards, then 6 maps and 5 reports (in index order: category, sector, year, title)
+PRODUCTS = (
+    [product(i, "Interactive Dashboards", "Health", 2024) for i in range(12)]
+    + [product(i, "Maps", "WASH", 2023) for i in range(3)]
+    + [product(i, "Maps", "WASH", 2024) for i in range(3)]
+    + [product(i, "Reports", "Education", 2024) for i in range(5)]
+)
+
+
+@pytest.fixture
+def state():
+    return {"catalogue": Catalogue(PRODUCTS, version="v1")}
+
+
+@pytest.fixture
+def client(state):
+    app = Flask(__name__)
+    CatalogueAPI(lambda: state["catalogue"], link=lambda catalogue, product: normalize_category(product["Category"])
+                 ).init_app(app)
+    return app.test_client()
+
+
+def titles(response):
+    return [product["Title"] for product in response.get_json()["products"]]
+
+
+def test_pages_follow_the_cursor_to_the_end(client):
+    seen = []
+    response = client.get("/api/products?limit=5")
+    while True:
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["count"] == len(PRODUCTS)
+        seen += titles(response)
+        if data["next"] is None:
+            break
+        response = client.get(f"/api/products?limit=5&cursor={data['next']}")
+    assert len(seen) == len(set(seen)) == len(PRODUCTS)
+
+
+def test_filters_select_groups(client):
+    response = client.get("/api/products?category=maps&year=2024&fields=Title,link")
+    data = response.get_json()
+    assert data["count"] == 3
+    assert data["products"][0] == {"Title": "Maps WASH 2024 0", "link": "maps"}
+
+    response = client.get("/api/products?category=maps&category=reports&limit=4")
+    assert response.get_json()["count"] == 11
+    assert [title.split()[0] for title in titles(response)] == ["Maps"] * 4
+
+    assert client.get("/api/products?fields=Title,Nope").status_code == 400
+
+
+def test_ndjson_streams_every_match(client):
+    response = client.get("/api/products?category=reports&format=ndjson&fields=Title")
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["Title"] for line in lines] == [f"Reports Education 2024 {i}" for i in range(5)]
+
+
+def test_facets_count_the_alternatives(client):
+    facets = client.get("/api/facets?category=maps").get_json()
+    assert facets["count"] == 6
+    # The category facet ignores its own filter; the others apply it
+    assert {item["slug"]: item["count"] for item in facets["facets"]["category"]} == {
+        "interactive-dashboards": 12, "maps": 6, "reports": 5}
+    assert facets["facets"]["year"] == [{"value": 2023, "count": 3}, {"value": 2024, "count": 3}]
+
+
+def test_negative_cursor_is_rejected(client):
+    # Paging backwards from the start of "maps" would return dashboards
+    response = client.get(f"/api/products?category=maps&cursor={encode_cursor('v1', -3)}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "invalid cursor"}
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor("v1", "x"), "bm8tY29sb24"])
+def test_malformed_cursor_is_rejected(client, cursor):
+    assert client.get(f"/api/products?cursor={cursor}").status_code == 400
+
+
+def test_cursor_past_the_end_is_an_empty_last_page(client):
+    response = client.get(f"/api/products?category=maps&cursor={encode_cursor('v1', 50)}")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data["count"], data["products"], data["next"]) == (6, [], None)
+
+
+def test_cursor_from_an_older_version_is_gone(client, state):
+    cursor = client.get("/api/products?limit=5").get_json()["next"]
+    state["catalogue"] = Catalogue(PRODUCTS[:-1], version="v2")
+    response = client.get(f"/api/products?limit=5&cursor={cursor}")
+    assert response.status_code == 410
+
+
+def test_group_rows_never_starts_before_the_groups(state):
+    index = state["catalogue"].index
+    groups = index.select_groups(categories=["maps"])
+    assert list(index.group_rows(groups, -3)) == list(index.group_rows(groups))
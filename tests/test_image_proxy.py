@@ -0,0 +1,146 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+from flask import Flask
+from PIL import Image
+
+from image_proxy import ImageProxy, thumbnail
+
+
+def jpeg(size=(960, 640)):
+    # Noise, so every image (and its thumbnail) is different and about the same size
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def image_route(data, delay=0):
+    def route(method):
+        time.sleep(delay)
+        return 200, {"Content-Type": "image/jpeg"}, data
+    return route
+
+
+@pytest.fixture
+def source(stub_server):
+    return stub_server({
+        "/a.jpg": image_route(jpeg()),
+        "/b.jpg": image_route(jpeg()),
+        "/c.jpg": image_route(jpeg()),
+        "/slow.jpg": image_route(jpeg(), delay=0.5),
+        "/broken.jpg": lambda method: (200, {"Content-Type": "image/jpeg"}, b"not an image"),
+    })
+
+
+@pytest.fixture
+def proxy(tmp_path, source):
+    # Only the stub's URLs may be proxied
+    proxy = ImageProxy(lambda src: src.startswith(source.url("/")), cache_dir=str(tmp_path / "cache"))
+    app = Flask(__name__)
+    proxy.init_app(app)
+    proxy.client = app.test_client
+    return proxy
+
+
+def get(proxy, src, width=240):
+    return proxy.client().get(proxy.url(src, width))
+
+
+def cached_files(proxy):
+    return sorted(path for _, _, path in proxy._entries())
+
+
+def test_thumbnail_fits_the_upright_image():
+    # A landscape photo taken in portrait (EXIF orientation 6) is a portrait card image
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 600), "red").save(buffer, "JPEG", exif=exif.tobytes())
+    assert Image.open(io.BytesIO(thumbnail(buffer.getvalue(), 240, "jpeg"))).size == (180, 360)
+
+
+def test_miss_is_fetched_once_then_served_from_disk(proxy, source):
+    src = source.url("/a.jpg")
+
+    response = get(proxy, src)
+    assert response.status_code == 200
+    assert response.mimetype == "image/jpeg"
+    assert Image.open(io.BytesIO(response.data)).size == (240, 160)
+    assert len(cached_files(proxy)) == 1
+
+    response = get(proxy, src)
+    assert response.status_code == 200
+    assert source.count("/a.jpg") == 1
+    assert (proxy.misses, proxy.hits) == (1, 1)
+
+    # Each width is its own entry
+    assert Image.open(io.BytesIO(get(proxy, src, 480).data)).size == (480, 320)
+    assert len(cached_files(proxy)) == 2
+
+
+def test_concurrent_misses_share_one_fetch(proxy, source):
+    src = source.url("/slow.jpg")
+    statuses = []
+
+    def request():
+        statuses.append(get(proxy, src).status_code)
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 4
+    assert source.count("/slow.jpg") == 1
+    # The waiters are counted as coalesced only, not as misses too
+    assert (proxy.misses, proxy.coalesced, proxy.hits) == (1, 3, 0)
+
+
+def test_least_recently_served_is_evicted(proxy, source):
+    a, b, c = (source.url(path) for path in ("/a.jpg", "/b.jpg", "/c.jpg"))
+    get(proxy, a)
+    time.sleep(0.05)
+    get(proxy, b)
+    size = max(os.path.getsize(path) for path in cached_files(proxy))
+    # Room for two thumbnails and a half
+    proxy.max_bytes = size * 2.5
+    time.sleep(0.05)
+    get(proxy, a)  # a hit: now b is the least recently served
+    time.sleep(0.05)
+
+    assert get(proxy, c).status_code == 200
+    assert proxy.evictions == 1
+    assert proxy.stats()["cache_bytes"] <= proxy.max_bytes
+    # a and c are still cached, b is fetched again
+    fetches = source.count("/b.jpg")
+    get(proxy, a)
+    get(proxy, c)
+    assert source.count("/a.jpg") == 1 and source.count("/c.jpg") == 1
+    get(proxy, b)
+    assert source.count("/b.jpg") == fetches + 1
+
+
+def test_only_allowed_sources_are_proxied(proxy, source):
+    assert get(proxy, "http://example.com/a.jpg").status_code == 404
+    assert proxy.client().get(f"{proxy.path}?src=file:///etc/passwd&w=240").status_code == 404
+    assert get(proxy, source.url("/a.jpg"), width=100).status_code == 404
+    assert source.requests == []
+
+
+@pytest.mark.parametrize("path", ["/missing.jpg", "/broken.jpg"])
+def test_failures_redirect_to_the_source(proxy, source, path):
+    src = source.url(path)
+
+    response = get(proxy, src)
+    assert response.status_code == 302
+    assert response.location == src
+    assert proxy.errors == 1
+    assert cached_files(proxy) == []
+
+    # Not retried for a while
+    assert get(proxy, src).status_code == 302
+    assert source.count(path) == 1
@@ -0,0 +1,105 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+import link_health
+from link_health import BLOCKED, BROKEN, BROKEN_AFTER, OK, RESTRICTED, SLOW, LinkHealth, check_all
+
+
+def page(status=200, headers=None, delay=0):
+    def route(method):
+        time.sleep(delay)
+        return status, headers or {}, b"<html></html>"
+    return route
+
+
+def get_only(method):
+    # A server that refuses HEAD
+    return (405, {}, b"") if method == "HEAD" else (200, {}, b"<html></html>")
+
+
+@pytest.fixture
+def links(stub_server):
+    return stub_server({
+        "/ok": page(),
+        "/get-only": get_only,
+        "/moved": page(301, {"Location": "/ok"}),
+        "/loop": page(302, {"Location": "/loop"}),
+        "/deny": page(headers={"X-Frame-Options": "DENY"}),
+        "/csp": page(headers={"Content-Security-Policy": "default-src 'self'; frame-ancestors 'self'"}),
+        "/csp-allowed": page(headers={"Content-Security-Policy": "frame-ancestors https://example.org"}),
+        "/private": page(401),
+        "/slow": page(delay=0.3),
+        "/hang": page(delay=3),
+        "/down": page(503),
+    })
+
+
+def refused_url():
+    # A local port nothing listens on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/"
+
+
+def test_check_all_classifies_links(links, monkeypatch):
+    monkeypatch.setattr(link_health, "SLOW_SECONDS", 0.2)
+    paths = ["/ok", "/get-only", "/moved", "/loop", "/deny", "/csp", "/csp-allowed", "/private", "/slow", "/hang",
+             "/missing", "/down"]
+    urls = [links.url(path) for path in paths] + [refused_url(), "ftp://example.org/file"]
+
+    results = asyncio.run(check_all(urls, concurrency=4, timeout=1))
+    states = {url: result["state"] for url, result in results.items()}
+
+    assert states == dict(zip(urls, [OK, OK, OK, BROKEN, BLOCKED, BLOCKED, OK, RESTRICTED, SLOW, BROKEN,
+                                     BROKEN, BROKEN, BROKEN, BROKEN]))
+    assert links.count("/get-only", "HEAD") == 1 and links.count("/get-only", "GET") == 1
+    assert links.count("/ok", "HEAD") == 2  # checked, and the target of /moved
+    assert results[links.url("/ok")]["status"] == 200
+    assert results[links.url("/missing")]["status"] == 404
+    assert results[links.url("/loop")]["error"] == "too many redirects"
+    assert results[links.url("/hang")]["error"] == "no response in 1s"
+    assert results[links.url("/slow")]["latency"] >= 0.3
+
+
+def test_broken_links_are_flagged_after_repeated_failures(links, tmp_path, monkeypatch):
+    monkeypatch.setattr(link_health, "SLOW_SECONDS", 0.2)
+    flaky = {"status": 503}
+    links.routes["/flaky"] = lambda method: (flaky["status"], {}, b"")
+    urls = [links.url(path) for path in ("/ok", "/flaky", "/private", "/slow")]
+    path = str(tmp_path / "link-health.json")
+    # interval 0: every run() is due (and no background thread is started)
+    health = LinkHealth(lambda: urls, path=path, interval=0, timeout=2)
+
+    for run in range(1, BROKEN_AFTER + 1):
+        assert health.run()
+        assert health.results[urls[1]]["failures"] == run
+        if run < BROKEN_AFTER:
+            # One failed check is not enough to flag a product
+            assert health.problem(urls[1]) is None
+            assert not health.is_down(urls[1])
+    assert health.problem(urls[1]) == BROKEN
+    assert health.is_down(urls[1])
+    assert health.problem(urls[0]) is None
+    assert health.problem(urls[2]) == RESTRICTED
+    assert health.problem(urls[3]) == SLOW
+    assert health.problem(links.url("/unchecked")) is None
+    # Worst first
+    assert [(problem["url"], problem["state"]) for problem in health.problems()] == [
+        (urls[1], BROKEN), (urls[2], RESTRICTED), (urls[3], SLOW)]
+    assert health.stats()["down"] == 1 and health.passes == BROKEN_AFTER
+
+    # The other workers load the results from the shared file
+    other = LinkHealth(lambda: [], path=path, interval=0)
+    other.load()
+    assert other.is_down(urls[1])
+
+    # Back up: the failure count starts over
+    flaky["status"] = 200
+    assert health.run()
+    assert health.results[urls[1]]["failures"] == 0
+    assert health.problem(urls[1]) is None
+    assert [problem["url"] for problem in health.problems()] == [urls[2], urls[3]]
@@ -0,0 +1,25 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, "OPS_TOKEN", "s3cret")
+    return app.server.test_client()
+
+
+@pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer wrong"}, {"Authorization": "s3cret"}])
+def test_warm_needs_the_ops_token(client, headers):
+    assert client.post("/catalogue/tenants/nigeria/warm", headers=headers).status_code == 403
+
+
+def test_warm_is_off_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(app, "OPS_TOKEN", "")
+    assert client.post("/catalogue/tenants/nigeria/warm", headers={"Authorization": "Bearer "}).status_code == 403
+
+
+def test_warm_with_the_token(client):
+    response = client.post("/catalogue/tenants/nowhere/warm", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "unknown tenant: nowhere"}
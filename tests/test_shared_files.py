@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from shared_files import AtomicFile, file_lock, fcntl, write_atomic
+
+
+def test_write_atomic_replaces_the_file(tmp_path):
+    path = str(tmp_path / "build" / "data.json")
+    write_atomic(path, "first")
+    write_atomic(path, b"second")
+    assert open(path, "rb").read() == b"second"
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    assert os.listdir(tmp_path / "build") == ["data.json"]
+
+
+def test_failed_write_leaves_the_old_file(tmp_path):
+    path = str(tmp_path / "data.json")
+    write_atomic(path, "old")
+    with pytest.raises(RuntimeError):
+        with AtomicFile(path, "w") as f:
+            f.write("half")
+            raise RuntimeError
+    report = AtomicFile(path, "w")
+    report.file.write("discarded")
+    report.discard()
+    assert open(path).read() == "old"
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+@pytest.mark.skipif(fcntl is None, reason="no lock files without fcntl")
+def test_non_blocking_lock_is_not_acquired_while_held(tmp_path):
+    path = str(tmp_path / "pass.lock")
+    with file_lock(path) as held:
+        assert held
+        with file_lock(path, blocking=False) as acquired:
+            assert not acquired
+    with file_lock(path, blocking=False) as acquired:
+        assert acquired